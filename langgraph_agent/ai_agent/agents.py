@@ -1,11 +1,15 @@
 from langgraph.graph import StateGraph, END
-from typing import TypedDict, Literal
+from typing import TypedDict, Literal, Annotated
 
+import contextvars
 import json
+import operator
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import zip_longest
 from datetime import date 
 import google.generativeai as genai
-from langchain_community.tools import DuckDuckGoSearchRun
 from dotenv import load_dotenv
 import os
 import sys
@@ -14,20 +18,109 @@ sys.path.append(os.path.dirname(__file__))
 from ai_agent.decision_prompt import decision_prompt_flash, decision_prompt_gemma
 from ai_agent.synthesis_prompt import synthesis_prompt_flash, synthesis_prompt_gemma
 from ai_agent.verify_prompt import verify_prompt
+from ai_agent.search import PooledSearchTool
+from ai_agent.cassette import CassetteDeepReader, CassetteModel, CassetteSearchTool, cassette_from_env
+from ai_agent.deep_read import deep_reader_from_env, format_passages
+from ai_agent.context import get_request, request_scope
+from ai_agent.blobs import MemoryBlobStore
+from ai_agent.batching import verify_batcher_from_env
+from ai_agent.verifiers import parse_verdict, verifier_engine_from_env
+from ai_agent.decompose import plan_sub_queries
+from ai_agent.profiling import profiler_from_env
+from ai_agent.experiments import experiment_chain, experiment_from_env, experiment_option, experiment_prompt
+from ai_agent.tracing import TracedModel, TracedSearchTool, build_trace_record, trace_writer_from_env, traced_node, traced_worker
+from ai_agent.retry_policy import reformulate_query, retry_policy_from_env
+from ai_agent.checkpointing import IdempotencyConflict, RequestInProgress, checkpoint_store_from_env
 
 load_dotenv()
-api_key = os.getenv("GOOGLE_API_KEY")
-if not api_key:
-    raise RuntimeError("GOOGLE_API_KEY is not set....")
 
-genai.configure(api_key=api_key)
+# "live" talks to Gemini and DuckDuckGo, "stub" uses local fakes for load testing
+backend = os.getenv("AGENT_BACKEND", "live")
+
+# Optionally read the top result pages, not just the search snippets
+deep_read = os.getenv("AGENT_DEEP_READ", "0") == "1"
 
 max_retries = 2
 
-# Initialize the models
-flash_model = genai.GenerativeModel("gemini-2.5-flash")
-flash_lite_model = genai.GenerativeModel("gemini-2.5-flash-lite")
-gemma_model = genai.GenerativeModel("gemma-3-12b-it")
+# Compound questions are split into at most this many searches, run concurrently
+max_sub_queries = int(os.getenv("AGENT_MAX_SUB_QUERIES", "4"))
+sub_search_pool = ThreadPoolExecutor(
+    max_workers=int(os.getenv("AGENT_SUB_SEARCH_WORKERS", "16")),
+    thread_name_prefix="sub-search"
+)
+
+# Picks the recovery action for each verification failure
+retry_policy = retry_policy_from_env()
+
+# Optional durable checkpoints of AgentState after every node
+checkpoint_store = checkpoint_store_from_env()
+
+# Large payloads are kept out of the state and referenced by ID.
+# With checkpointing they are persisted alongside the checkpoints.
+blob_store = checkpoint_store.blobs if checkpoint_store else MemoryBlobStore()
+
+# Initialize the models and the search tool.
+# They are created once per process and shared by every worker thread: the
+# genai client multiplexes all calls over a single channel and the search tool
+# keeps a long-lived client per thread.
+cassette = cassette_from_env()
+
+if backend == "stub":
+    from ai_agent.stubs import StubDeepReader, StubModel, StubSearchTool
+
+    flash_model = StubModel("gemini-2.5-flash")
+    flash_lite_model = StubModel("gemini-2.5-flash-lite")
+    gemma_model = StubModel("gemma-3-12b-it")
+    search_tool = StubSearchTool()
+    deep_reader = StubDeepReader() if deep_read else None
+
+elif cassette is not None and cassette.mode == "replay":
+    # Replay never reaches the live services
+    flash_model = flash_lite_model = gemma_model = search_tool = deep_reader = None
+
+else:
+    api_key = os.getenv("GOOGLE_API_KEY")
+    if not api_key:
+        raise RuntimeError("GOOGLE_API_KEY is not set....")
+
+    genai.configure(api_key=api_key)
+
+    flash_model = genai.GenerativeModel("gemini-2.5-flash")
+    flash_lite_model = genai.GenerativeModel("gemini-2.5-flash-lite")
+    gemma_model = genai.GenerativeModel("gemma-3-12b-it")
+    search_tool = PooledSearchTool()
+    deep_reader = deep_reader_from_env()
+
+# Record or replay every model and search call through the cassette
+if cassette is not None:
+    flash_model = CassetteModel(cassette, "gemini-2.5-flash", flash_model)
+    flash_lite_model = CassetteModel(cassette, "gemini-2.5-flash-lite", flash_lite_model)
+    gemma_model = CassetteModel(cassette, "gemma-3-12b-it", gemma_model)
+    search_tool = CassetteSearchTool(cassette, search_tool)
+    if deep_read:
+        deep_reader = CassetteDeepReader(cassette, deep_reader)
+
+# Attribute every model and search call to the request and node that made it
+flash_model = TracedModel("flash", flash_model)
+flash_lite_model = TracedModel("flash_lite", flash_lite_model)
+gemma_model = TracedModel("gemma", gemma_model)
+search_tool = TracedSearchTool(search_tool)
+
+# Optionally merge concurrent requests' primary verification calls into one prompt
+verify_batcher = verify_batcher_from_env("flash_lite", flash_lite_model)
+
+# Verifiers run concurrently; the first `AGENT_VERIFY_QUORUM` agreeing verdicts decide
+verify_model_names = os.getenv("AGENT_VERIFY_MODELS", "flash_lite,gemma").split(",")
+verifier_engine = verifier_engine_from_env()
+
+# Optional per-request trace records written to rolling Parquet files
+trace_writer = trace_writer_from_env()
+
+# On-demand profiling of single requests (off unless sampled or asked for)
+profiler = profiler_from_env()
+
+# Optional A/B experiment over model chains, prompts and options
+experiment = experiment_from_env()
 
 # Failure Modes
 FAILURE_TYPES = {
@@ -36,24 +129,36 @@ FAILURE_TYPES = {
     "SYNTHESIS_ERROR",
     "VERIFICATION_NOT_GROUNDED",
     "VERIFICATION_HALLUCINATION",
-    "VERIFICATION_LOW_CONFIDENCE"
+    "VERIFICATION_LOW_CONFIDENCE",
+    "VERIFICATION_UNAVAILABLE"
 }
 
 class AgentState(TypedDict, total=False):
     """
     AgentState: Defines the structure of data flowing through the graph.
+
+    Nodes return only the fields they change. Fields annotated with a
+    reducer accumulate across nodes and retries instead of being replaced.
     """       
     user_input : str
     decision : dict 
     decision_model : str 
     route_reason : str
-    search_result : str 
+    sub_queries : list
+    search_query : str
+    search_refs : Annotated[list, operator.add]
+    page_urls : list
     final_answer : str
     verification : dict 
+    verification_model : str
+    verification_history : Annotated[list, operator.add]
     retries : int
+    retry_action : str
+    retry_failure_type : str
     failure_type : str 
     confidence : float 
     latency_ms : float
+    variant : str
 
 def decide_node(state: AgentState) -> AgentState:
     """
@@ -65,11 +170,12 @@ def decide_node(state: AgentState) -> AgentState:
     today = date.today().isoformat()
 
     # Model fallback chain: try flash first, then flash_lite, then gemma
-    models = [
-        ("flash", flash_model, decision_prompt_flash),
-        ("flash_lite", flash_lite_model, decision_prompt_flash),
-        ("gemma", gemma_model, decision_prompt_gemma)
-    ]
+    # (an experiment variant may reorder the chain or swap the prompts)
+    models = experiment_chain("decision", [
+        ("flash", flash_model, experiment_prompt("decision_prompt_flash", decision_prompt_flash)),
+        ("flash_lite", flash_lite_model, experiment_prompt("decision_prompt_flash", decision_prompt_flash)),
+        ("gemma", gemma_model, experiment_prompt("decision_prompt_gemma", decision_prompt_gemma))
+    ])
 
     last_error = None 
 
@@ -89,7 +195,6 @@ def decide_node(state: AgentState) -> AgentState:
             print(f"Decision made by model: {name}")
             print(f"Routing reason: {decision.get('reason', '')  }")
             return {
-                **state,
                 "decision" : decision,
                 "decision_model" : name,
                 "route_reason" : decision.get("reason", "")  
@@ -103,41 +208,143 @@ def decide_node(state: AgentState) -> AgentState:
     # Conservative fallback: default to SEARCH action
     print(f"[ERROR] All decision models failed. Defaulting to SEARCH. Last error: {last_error}")
     return {
-        **state,
         "decision": {"action": "SEARCH"},
         "decision_model": "fallback",
         "route_reason": "Decision model failed on all attempts; defaulting to SEARCH",
         "failure_type" : "DECISION_PARSE_ERROR" 
     }
 
-search_tool = DuckDuckGoSearchRun()
+def decompose_node(state: AgentState) -> AgentState:
+    """
+    Decompose Node: Splits a multi-part question into independent search queries.
+    """
+
+    sub_queries = plan_sub_queries(
+        state.get("decision") or {},
+        state["user_input"],
+        experiment_option("max_sub_queries", max_sub_queries),
+        heuristic=state.get("decision_model") == "fallback"
+    )
+
+    if len(sub_queries) > 1:
+        print(f"[INFO] Question split into {len(sub_queries)} sub-queries: {sub_queries}")
+        return {"sub_queries" : sub_queries}
+
+    return {"sub_queries" : []}
+
+def search_queries(state: AgentState) -> list:
+    """
+    Returns the queries search_node should run for the current attempt.
+    """
+
+    sub_queries = state.get("sub_queries") or []
+    retries = state.get("retries", 0)
+
+    # Search is only re-entered on a "research" retry, which reformulates every query
+    if len(sub_queries) > 1:
+        return [reformulate_query(q, retries) if retries else q for q in sub_queries]
+
+    return [state.get("search_query") or state["user_input"]]
 
 def search_node(state: AgentState) -> AgentState:
     """
     Search Node: Performs web search using DuckDuckGo
     """
 
-    # Extract user_input from state
-    user_input = state["user_input"]
+    # Retries may search with a reformulated query
+    queries = search_queries(state)
+    namespace = get_request().blob_namespace
 
-    try:
-        # Run DuckDuckGo Search
-        print("[INFO] Running search tool...")
-        search_result = search_tool.run(user_input)
+    def run_search(query):
+        print(f"[INFO] Running search tool... (query: {query})")
+
+        # Deep read needs the result URLs, not just the joined snippets
+        if deep_read:
+            hits = search_tool.results(query)
+            text = " ".join(hit["body"] for hit in hits) or "No good DuckDuckGo Search Result was found"
+            return text, [hit["href"] for hit in hits]
+
+        return search_tool.run(query), []
 
+    if len(queries) == 1:
+        try:
+            outcomes = [(queries[0], run_search(queries[0]), None)]
+        except Exception as e:
+            outcomes = [(queries[0], None, e)]
+    else:
+        # Each sub-search runs in a copy of the request context so its calls are traced,
+        # and is profiled and timed as part of this node
+        futures = [
+            (query, sub_search_pool.submit(contextvars.copy_context().run, traced_worker(run_search), query))
+            for query in queries
+        ]
+        outcomes = []
+        for query, future in futures:
+            try:
+                outcomes.append((query, future.result(), None))
+            except Exception as e:
+                outcomes.append((query, None, e))
+
+    refs = []
+    url_lists = []
+    for query, output, error in outcomes:
+        if error is not None:
+            print(f"[ERROR] Search failed for '{query}': {error}")
+            continue
+
+        search_result, urls = output
+        url_lists.append(urls)
         print(f"[SUCCESS] Search completed. Result length: {len(search_result)} chars")
+
+        # Sub-query results are labelled so synthesis can attribute each part of the answer
+        if len(queries) > 1:
+            search_result = f"[Results for: {query}]\n{search_result}"
+        refs.append(blob_store.put(namespace, search_result))
+
+    if not refs:
         return {
-            **state,
-            "search_result" : search_result
-        }
-    
-    except Exception as e:
-        print(f"[ERROR] {e}")
-        return {
-            **state,
-            "search_result" : e,
             "failure_type" : "SEARCH_ERROR"
         }
+
+    update = {
+        # Results from retries are added to earlier ones, giving synthesis more context
+        "search_refs" : refs
+    }
+
+    if deep_read:
+        # Interleave the sub-queries' hits so every part gets its top pages read
+        update["page_urls"] = list(dict.fromkeys(url for rank in zip_longest(*url_lists) for url in rank if url))
+
+    return update
+
+def deep_read_node(state: AgentState) -> AgentState:
+    """
+    Deep Read Node: Fetches the top result pages and adds their most relevant passages.
+    """
+
+    try:
+        passages = deep_reader.read(state["user_input"], state.get("page_urls") or [])
+    except Exception as e:
+        # Synthesis still has the search snippets
+        print(f"[WARN] Deep read failed: {e}")
+        return {}
+
+    if not passages:
+        print("[INFO] Deep read found no relevant passages")
+        return {}
+
+    print(f"[SUCCESS] Deep read added {len(passages)} passages")
+    extracts = "[Page extracts]\n" + format_passages(passages)
+    return {
+        "search_refs" : [blob_store.put(get_request().blob_namespace, extracts)]
+    }
+
+def load_search_results(state: AgentState) -> str:
+    """
+    Returns the text of every search made for this request so far.
+    """
+
+    return "\n\n".join(blob_store.get(ref) for ref in state.get("search_refs") or [])
     
 def synthesis_node(state: AgentState) -> AgentState:
     """
@@ -145,14 +352,14 @@ def synthesis_node(state: AgentState) -> AgentState:
     """
 
     user_input = state["user_input"]
-    tool_output = state["search_result"]
+    tool_output = load_search_results(state)
     today = date.today().isoformat()
 
-    models = [
-        ("flash", flash_model, synthesis_prompt_flash),
-        ("flash_lite", flash_lite_model, synthesis_prompt_flash),
-        ("gemma", gemma_model, synthesis_prompt_gemma)
-    ]
+    models = experiment_chain("synthesis", [
+        ("flash", flash_model, experiment_prompt("synthesis_prompt_flash", synthesis_prompt_flash)),
+        ("flash_lite", flash_lite_model, experiment_prompt("synthesis_prompt_flash", synthesis_prompt_flash)),
+        ("gemma", gemma_model, experiment_prompt("synthesis_prompt_gemma", synthesis_prompt_gemma))
+    ])
     
     last_error = None
 
@@ -165,7 +372,6 @@ def synthesis_node(state: AgentState) -> AgentState:
 
             print(f"[SUCCESS] Synthesis completed by model: {name}")
             return {
-                **state,
                 "final_answer" : final_answer
             }
 
@@ -178,7 +384,6 @@ def synthesis_node(state: AgentState) -> AgentState:
     error_msg = f"Synthesis failed on all models. Last error: {last_error}"
     print(f"[ERROR] {error_msg}")
     return {
-        **state,
         "final_answer": error_msg,
         "failure_type" : "SYNTHESIS_ERROR"
     }
@@ -194,7 +399,6 @@ def answer_node(state: AgentState) -> AgentState:
     # Return updated state with final answer
     print(f"[SUCCESS] Direct answer provided (no search needed)")
     return {
-        **state, 
         "final_answer": answer_content  
     }  
 
@@ -217,7 +421,7 @@ def verify(state: AgentState) -> AgentState:
 
     user_input = state["user_input"]
     final_answer = state.get("final_answer","")
-    search_result = state.get("search_result","")
+    search_result = load_search_results(state)
     decision = state.get("decision", {})
 
     today = date.today().isoformat()
@@ -228,89 +432,103 @@ def verify(state: AgentState) -> AgentState:
         else "NO SEARCH WAS USED"
     )
 
-    prompt = verify_prompt.format(today=today,user_input=user_input,search_result=search_context,final_answer=final_answer)
+    variant_prompt = experiment_prompt("verify_prompt", verify_prompt)
+    prompt = variant_prompt.format(today=today,user_input=user_input,search_result=search_context,final_answer=final_answer)
+
+    # Batches are built from the default verify prompt, so a variant with its own prompt is not batched
+    batcher = verify_batcher if variant_prompt == verify_prompt else None
+
+    verify_models = experiment_chain("verify", [
+        (name, model) for name, model in [("flash_lite", flash_lite_model), ("gemma", gemma_model)]
+        if name in verify_model_names
+    ])
+
+    # A re-verification asks only the other model(s), unless there are none
+    if state.get("retry_action") == "reverify":
+        others = [m for m in verify_models if m[0] != state.get("verification_model")]
+        verify_models = others or verify_models
+
+    def verifier(name, model):
+        def call():
+            verify_text = None
+            if name == "flash_lite" and batcher is not None:
+                verify_text = batcher.verify(user_input, search_context, final_answer)
+
+            # Unbatched, or the batch gave no usable verdict for this answer
+            if verify_text is None:
+                verify_text = model.generate_content(prompt).text
+            return parse_verdict(verify_text)
+        return call
+
+    # Verifiers run on the engine's threads; they are profiled and timed as part of this node
+    result = verifier_engine.run([(name, traced_worker(verifier(name, model))) for name, model in verify_models])
+    verdict, name = result.verdict, result.model
+
+    # Verifiers that lose the race still finish their calls; the trace waits for them
+    ctx = get_request()
+    if ctx is not None:
+        ctx.pending.extend(result.pending)
+
+    if result.degraded:
+        # No verifier answered: the configured degraded mode decides
+        if verdict["verdict"] == "pass":
+            return {
+                "verification" : verdict,
+                "verification_model" : None,
+                "verification_history" : [{"verdict" : "pass", "model" : None, "degraded" : True}],
+                "failure_type" : None,
+                "confidence" : 0.5
+            }
+        return {
+            "verification" : verdict,
+            "verification_model" : None,
+            "verification_history" : [{"verdict" : "fail", "model" : None, "failure_type" : "VERIFICATION_UNAVAILABLE"}],
+            "failure_type" : "VERIFICATION_UNAVAILABLE",
+            "confidence" : 0.3
+        }
 
-    verify_models = [
-        ("flash_lite", flash_lite_model),
-        ("gemma", gemma_model)
-    ]
+    print(f"Verdict: {verdict.get('verdict','')} made by model: {name}")
 
-    try:
-        for name, model in verify_models:
-            try:
-                response = model.generate_content(prompt)
-                verfiy_text = response.text.strip()
-
-                cleaned = (
-                    verfiy_text
-                    .replace("```json", "")
-                    .replace("```", "")
-                    .replace("json", "")
-                    .strip()
-                )
-
-                verdict = json.loads(cleaned)
-
-                print(f"Verdict: {verdict.get('verdict','')} made by model: {name}")
-
-                if verdict.get("verdict") == "pass":
-                    return {
-                        **state,
-                        "verification" : verdict,
-                        "failure_type" : None,
-                        "confidence": 0.9 
-                    }
-
-                failure_type = None
-
-                if verdict.get("verdict") == "fail":
-                    reason = verdict.get("reason","")
-                    reasons = [r.strip() for r in reason.split("|")] 
-
-                    if "hallucination" in reasons:
-                        failure_type = "VERIFICATION_HALLUCINATION"
-                    elif "grounding" in reasons:
-                        failure_type = "VERIFICATION_NOT_GROUNDED"
-                    elif "routing" in reasons:
-                        failure_type = "DECISION_PARSE_ERROR"
-                    elif "format" in reasons:
-                        failure_type = "SYNTHESIS_ERROR"
-                    else:
-                        failure_type = "VERIFICATION_NOT_GROUNDED"
-
-                if failure_type == "VERIFICATION_HALLUCINATION":
-                    confidence = 0.1
-                elif failure_type == "VERIFICATION_NOT_GROUNDED":
-                    confidence = 0.4
-                else:
-                    confidence = 0.3
-
-                print(f"Verification failure type: {failure_type} with confidence {confidence}")  
-
-                return {
-                    **state,
-                    "verification" : verdict,
-                    "failure_type" : failure_type,
-                    "confidence" : confidence
-                }
-            
-            except Exception as e:
-                print(f"Verification failed on model: {e}")
-                continue
-        
-    except Exception as e:
-        # Conservative default: fail verification
-        print(f"[ERROR] Verification failed: {e}")
+    if verdict.get("verdict") == "pass":
         return {
-            **state,
-            "verification": {
-                "verdict": "fail",
-                "reason": "format"
-            },
-            "failure_type": "SYNTHESIS_ERROR",
-            "confidence" : 0.3
+            "verification" : verdict,
+            "verification_model" : name,
+            "verification_history" : [{"verdict" : "pass", "model" : name}],
+            "failure_type" : None,
+            "confidence": 0.9 
         }
 
+    reason = verdict.get("reason","")
+    reasons = [r.strip() for r in reason.split("|")] 
+
+    if "hallucination" in reasons:
+        failure_type = "VERIFICATION_HALLUCINATION"
+    elif "grounding" in reasons:
+        failure_type = "VERIFICATION_NOT_GROUNDED"
+    elif "routing" in reasons:
+        failure_type = "DECISION_PARSE_ERROR"
+    elif "format" in reasons:
+        failure_type = "SYNTHESIS_ERROR"
+    else:
+        failure_type = "VERIFICATION_NOT_GROUNDED"
+
+    if failure_type == "VERIFICATION_HALLUCINATION":
+        confidence = 0.1
+    elif failure_type == "VERIFICATION_NOT_GROUNDED":
+        confidence = 0.4
+    else:
+        confidence = 0.3
+
+    print(f"Verification failure type: {failure_type} with confidence {confidence}")  
+
+    return {
+        "verification" : verdict,
+        "verification_model" : name,
+        "verification_history" : [{"verdict" : verdict.get("verdict"), "model" : name, "failure_type" : failure_type}],
+        "failure_type" : failure_type,
+        "confidence" : confidence
+    }
+
 def verification_router(state: AgentState) -> Literal["pass","retry","stop","abort"]:
     """
     Routes based on verification result.
@@ -320,6 +538,16 @@ def verification_router(state: AgentState) -> Literal["pass","retry","stop","abo
     retries = state.get("retries", 0)
     failure_type = state.get("failure_type", "")
 
+    # Feed the outcome of the previous recovery action back to the policy
+    # (shadow runs use a different configuration, so they are left out)
+    ctx = get_request()
+    if state.get("retry_action") and not (ctx and ctx.shadow):
+        retry_policy.record_outcome(
+            state.get("retry_failure_type"),
+            state["retry_action"],
+            verification.get("verdict") == "pass"
+        )
+
     # Success path
     if verification.get("verdict") == "pass":
         return "pass"
@@ -329,25 +557,45 @@ def verification_router(state: AgentState) -> Literal["pass","retry","stop","abo
         return "abort"
     
     # Failure path
-    if retries < max_retries:
+    if retries < experiment_option("max_retries", max_retries):
         return "retry"
     
     # Retries exhausted
     return "stop"
 
 def increment_retry(state : AgentState) -> AgentState:
-    return {
-        **state,
-        "retries" : state.get("retries",0) + 1
+    """
+    Retry Node: Counts the retry and picks the cheapest recovery action for the failure.
+    """
+
+    retries = state.get("retries",0) + 1
+    action = retry_policy.choose(state)
+    print(f"[INFO] Retry {retries}: {state.get('failure_type')} -> {action}")
+
+    update = {
+        "retries" : retries,
+        "retry_action" : action,
+        "retry_failure_type" : state.get("failure_type")
     }
 
+    if action == "research":
+        update["search_query"] = reformulate_query(state["user_input"], retries)
+
+    return update
+
+def retry_router(state: AgentState) -> Literal["research","resynthesize","reverify","stop"]:
+    """
+    Routes a retry to the node that performs the chosen recovery action.
+    """
+
+    return state.get("retry_action") or "stop"
+
 def abort_node(state: AgentState) -> AgentState:
     return {
-        **state,
         "final_answer" : "I can't reliably answer this question based on verified information. Please try rephrasing or check an authoritative source."
     } 
 
-def create_agent_graph():
+def create_agent_graph(checkpointer=None):
     """
     Creates and compiles the LangGraph agent workflow.
     """
@@ -355,14 +603,17 @@ def create_agent_graph():
     # Initialize the graph with our state type
     workflow = StateGraph(AgentState)
 
-    # Adding nodes to the graph
-    workflow.add_node("decide", decide_node)
-    workflow.add_node("search", search_node)
-    workflow.add_node("synthesize", synthesis_node)
-    workflow.add_node("answer", answer_node)
-    workflow.add_node("verify", verify)
-    workflow.add_node("increment_retry", increment_retry)
-    workflow.add_node("abort", abort_node)
+    # Adding nodes to the graph (each one timed for tracing)
+    workflow.add_node("decide", traced_node("decide", decide_node))
+    workflow.add_node("decompose", traced_node("decompose", decompose_node))
+    workflow.add_node("search", traced_node("search", search_node))
+    if deep_read:
+        workflow.add_node("deep_read", traced_node("deep_read", deep_read_node))
+    workflow.add_node("synthesize", traced_node("synthesize", synthesis_node))
+    workflow.add_node("answer", traced_node("answer", answer_node))
+    workflow.add_node("verify", traced_node("verify", verify))
+    workflow.add_node("increment_retry", traced_node("increment_retry", increment_retry))
+    workflow.add_node("abort", traced_node("abort", abort_node))
 
     # Setting the entry point
     workflow.set_entry_point("decide")
@@ -371,12 +622,17 @@ def create_agent_graph():
     workflow.add_conditional_edges("decide", 
                                    should_search, 
                                    {
-                                       "search" : "search",
+                                       "search" : "decompose",
                                        "answer" : "answer"
                                    })
     
     # Add remaining edges
-    workflow.add_edge("search", "synthesize")
+    workflow.add_edge("decompose", "search")
+    if deep_read:
+        workflow.add_edge("search", "deep_read")
+        workflow.add_edge("deep_read", "synthesize")
+    else:
+        workflow.add_edge("search", "synthesize")
     workflow.add_edge("synthesize", "verify")
     workflow.add_edge("answer", "verify")
 
@@ -392,55 +648,321 @@ def create_agent_graph():
         }
     )
 
-    workflow.add_edge("increment_retry", "search")
+    # Recovery routing
+    workflow.add_conditional_edges(
+        "increment_retry",
+        retry_router,
+        {
+            "research" : "search",
+            "resynthesize" : "synthesize",
+            "reverify" : "verify",
+            "stop" : END
+        }
+    )
     workflow.add_edge("abort", END)
 
     # Compile the graph
-    return workflow.compile() 
+    return workflow.compile(checkpointer=checkpointer) 
+
+agent_graph = create_agent_graph(checkpoint_store.saver if checkpoint_store else None)
 
-agent_graph = create_agent_graph()
+# Shadow runs use their own graph without checkpoints and a single worker;
+# when the backlog is full, further shadow runs are skipped
+if experiment is not None and experiment.shadow is not None:
+    shadow_graph = create_agent_graph()
+    shadow_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="shadow")
+    shadow_slots = threading.BoundedSemaphore(int(os.getenv("AGENT_SHADOW_MAX_PENDING", "8")))
+else:
+    shadow_graph = shadow_pool = shadow_slots = None
 
-def run_agent(user_input: str) -> str:
+def build_initial_state(user_input: str) -> AgentState:
     """
-    Main function to run the LangGraph agent.
+    Builds the state every graph invocation starts from.
     """
 
-    initial_state = {
+    return {
         "user_input": user_input,
         "decision": {},
         "decision_model": "",
         "route_reason": None,
-        "search_result": None,
+        "sub_queries": [],
+        "search_query": None,
+        "search_refs": [],
+        "page_urls": [],
         "final_answer": None,
         "verification": {},
+        "verification_model": None,
+        "verification_history": [],
         "retries": 0,
+        "retry_action": None,
+        "retry_failure_type": None,
         "failure_type": None,
         "confidence": None,
-        "latency_ms": None
+        "latency_ms": None,
+        "variant": None
     }
 
+def check_request_id(user_input: str, request_id: str, snapshot=None):
+    """
+    Raises IdempotencyConflict if `request_id` was already used for a
+    different question, or is still running. Lets callers reject a reused
+    key before they respond.
+    """
+
+    if checkpoint_store is None or request_id is None:
+        return
+
+    if snapshot is None:
+        if checkpoint_store.running(request_id):
+            raise RequestInProgress(f"Request ID {request_id} is still running")
+        snapshot = agent_graph.get_state(checkpoint_store.config(request_id))
+
+    if snapshot.values and snapshot.values.get("user_input") != user_input:
+        raise IdempotencyConflict(f"Request ID {request_id} was already used for a different question")
+
+def start_run(user_input: str, request_id: str):
+    """
+    Works out where a run starts. Returns (graph_input, config, state, finished).
+
+    Without checkpointing every run starts from the initial state. With
+    checkpointing, `request_id` is the idempotency key: a finished request
+    returns its stored final state and an interrupted one resumes after its
+    last completed node. A request that is still running is refused.
+    """
+
+    if checkpoint_store is None:
+        state = build_initial_state(user_input)
+        return state, None, state, False
+
+    ctx = get_request()
+    if not checkpoint_store.claim(request_id, ctx):
+        raise RequestInProgress(f"Request ID {request_id} is still running")
+
+    # A resumed run must find the blobs its earlier attempt stored
+    ctx.blob_namespace = request_id
+
+    config = checkpoint_store.config(request_id)
+    snapshot = agent_graph.get_state(config)
+
+    if not snapshot.values:
+        state = build_initial_state(user_input)
+        return state, config, state, False
+
+    check_request_id(user_input, request_id, snapshot)
+
+    if not snapshot.next:
+        print(f"[INFO] Request {request_id} already completed; returning stored result")
+        checkpoint_store.mark(request_id, "done")
+        state = dict(snapshot.values)
+        state["latency_ms"] = checkpoint_store.latency_ms(request_id)
+        return None, config, state, True
+
+    print(f"[INFO] Resuming request {request_id} at node(s): {', '.join(snapshot.next)}")
+    return None, config, dict(snapshot.values), False
+
+def end_run(ctx):
+    """
+    Cleans up after a run. Without checkpointing nothing can resume the
+    request, so its blobs are released right away.
+    """
+
+    if checkpoint_store is None:
+        blob_store.release(ctx.blob_namespace)
+    else:
+        checkpoint_store.release(ctx.request_id, ctx)
+
+def record_trace(state: AgentState, ctx):
+    """
+    Hands the finished request to the trace writer and the experiment, if enabled.
+    """
+
+    if trace_writer is None and experiment is None:
+        return
+
+    def write():
+        record = build_trace_record(state, ctx)
+        if experiment is not None and ctx.variant is not None:
+            experiment.record(ctx.variant, record, ctx.llm_calls, shadow=ctx.shadow)
+        if trace_writer is not None:
+            trace_writer.submit(record)
+
+    pending = [future for future in ctx.pending if not future.done()]
+    if not pending:
+        write()
+        return
+
+    # Calls still running (e.g. verifiers that lost the race) belong to this
+    # request; record it once they are done so its call counts and cost include them
+    state = dict(state)
+    remaining = [len(pending)]
+    lock = threading.Lock()
+
+    def finished(_):
+        with lock:
+            remaining[0] -= 1
+            last = remaining[0] == 0
+        if last:
+            write()
+
+    for future in pending:
+        future.add_done_callback(finished)
+
+def assign_variant(ctx):
+    if experiment is not None:
+        ctx.variant = experiment.assign(ctx.user_input)
+
+def run_shadow(user_input: str, request_id: str, variant):
+    """
+    Runs the shadow variant for one request; only its statistics are kept.
+    """
+
+    start_time = time.time()
+    with request_scope(user_input, f"{request_id}-shadow") as ctx:
+        ctx.variant = variant
+        ctx.shadow = True
+        try:
+            state = shadow_graph.invoke(build_initial_state(user_input))
+            state["latency_ms"] = round((time.time() - start_time) * 1000, 2)
+            record_trace(state, ctx)
+        except Exception as e:
+            print(f"[WARN] Shadow run failed: {e}")
+        finally:
+            blob_store.release(ctx.blob_namespace)
+
+def schedule_shadow(ctx):
+    """
+    Queues a shadow run if this request is sampled for one. It runs after the
+    request has finished, on its own worker, so it never delays the answer.
+    """
+
+    if shadow_pool is None:
+        return
+
+    variant = experiment.shadow_for(ctx.request_id)
+    if variant is None or not shadow_slots.acquire(blocking=False):
+        return
+
+    future = shadow_pool.submit(run_shadow, ctx.user_input, ctx.request_id, variant)
+    future.add_done_callback(lambda _: shadow_slots.release())
+
+def merge_update(state: AgentState, delta: dict):
+    """
+    Applies a node's partial update to a local copy of the state, the same
+    way the graph's reducers do.
+    """
+
+    for key, value in (delta or {}).items():
+        if key in ("search_refs", "verification_history"):
+            state[key] = (state.get(key) or []) + value
+        else:
+            state[key] = value
+
+def invoke_agent(user_input: str, request_id: str = None, profile: bool | str = False) -> AgentState:
+    """
+    Runs the graph for one query and returns the final state with latency attached.
+    With `profile` the request is always profiled, otherwise at AGENT_PROFILE_RATE;
+    a string `profile` is the ID its profile files are named by.
+    """
+
+    start_time = time.time()
+    with request_scope(user_input, request_id) as ctx:
+        ctx.profile = profiler.start(ctx, profile)
+        assign_variant(ctx)
+        try:
+            graph_input, config, result, finished = start_run(user_input, ctx.request_id)
+
+            if not finished:
+                if cassette is not None:
+                    cassette.record_request(ctx.request_id, user_input)
+
+                # Checkpoints are written synchronously so a crash never loses a completed node
+                result = agent_graph.invoke(graph_input, config=config, durability="sync" if config else None)
+                result["latency_ms"] = round((time.time() - start_time) * 1000, 2)
+
+                if checkpoint_store is not None:
+                    checkpoint_store.finish(ctx.request_id, result["latency_ms"])
+
+        finally:
+            end_run(ctx)
+            profiler.finish(ctx)
+
+    # A replayed result keeps the latency of the run that produced it
+    latency_ms = result["latency_ms"]
+    result["variant"] = ctx.variant.name if ctx.variant else None
+
+    if not finished:
+        record_trace(result, ctx)
+        schedule_shadow(ctx)
+
+    # Extract results for logging 
+    decision = result.get("decision", {})
+    decision_model = result.get("decision_model", "Unknown")
+    final_answer = result.get("final_answer", "No answer generated")
+
+    # Log execution summary
+    print("\n" + "-"*60)
+    print("Execution Summary:")
+    print(f"  • Decision: {decision.get('action', 'N/A')}")
+    print(f"  • Model Used: {decision_model}")
+    print(f"  • Retries: {result.get('retries', 0)}")
+    print(f"  • Failure Type: {result.get('failure_type')}")
+    print(f"  • Answer Length: {len(final_answer or '')} characters")
+    print(f"  • Latency: {latency_ms} ms")
+    print("-"*60 + "\n")
+
+    return result
+
+def stream_agent(user_input: str, request_id: str = None, profile: bool | str = False):
+    """
+    Runs the graph for one query, yielding (node, update, state) after each node.
+    `state` is the merged state so far; the last one yielded is the final state.
+    """
+
     start_time = time.time()
+    with request_scope(user_input, request_id) as ctx:
+        ctx.profile = profiler.start(ctx, profile)
+        assign_variant(ctx)
+        try:
+            graph_input, config, state, finished = start_run(user_input, ctx.request_id)
+            state["variant"] = ctx.variant.name if ctx.variant else None
+
+            if finished:
+                yield "checkpoint", {}, state
+                return
+
+            if cassette is not None:
+                cassette.record_request(ctx.request_id, user_input)
+
+            updates = agent_graph.stream(
+                graph_input,
+                config=config,
+                stream_mode="updates",
+                durability="sync" if config else None
+            )
+            for update in updates:
+                for node, delta in update.items():
+                    merge_update(state, delta)
+                    state["latency_ms"] = round((time.time() - start_time) * 1000, 2)
+                    yield node, delta, state
+
+            if checkpoint_store is not None:
+                checkpoint_store.finish(ctx.request_id, state.get("latency_ms"))
+
+            record_trace(state, ctx)
+            schedule_shadow(ctx)
+
+        finally:
+            end_run(ctx)
+            profiler.finish(ctx)
+
+def run_agent(user_input: str, profile: bool = False) -> str:
+    """
+    Main function to run the LangGraph agent.
+    """
+
     try:
-        result = agent_graph.invoke(initial_state)
-        latency_ms = round((time.time() - start_time) * 1000, 2)
-        result["latency_ms"] = latency_ms
-
-        # Extract results for logging 
-        decision = result.get("decision", {})
-        decision_model = result.get("decision_model", "Unknown")
-        final_answer = result.get("final_answer", "No answer generated")
-
-        print(result) 
-
-        # Log execution summary
-        print("\n" + "-"*60)
-        print("Execution Summary:")
-        print(f"  • Decision: {decision.get('action', 'N/A')}")
-        print(f"  • Model Used: {decision_model}")
-        print(f"  • Answer Length: {len(final_answer)} characters")
-        print("-"*60 + "\n")
-
-        return final_answer
+        result = invoke_agent(user_input, profile=profile)
+        return result.get("final_answer", "No answer generated")
     
     except Exception as e:
 
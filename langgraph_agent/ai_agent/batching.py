@@ -0,0 +1,164 @@
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+
+from ai_agent.context import get_request
+from ai_agent.verify_prompt import verify_batch_item, verify_batch_prompt
+
+
+class VerifyJob:
+    def __init__(self, item: dict):
+        self.item = item
+        self.done = threading.Event()
+        self.verdict = None
+        self.batch_size = 0
+        self.prompt_tokens = 0
+        self.output_tokens = 0
+
+
+def parse_batch_verdicts(text: str) -> dict:
+    """
+    Parses a batch verification response into {item id: verdict dict}.
+    Entries without a valid id or verdict are left out.
+    """
+    cleaned = text.strip().replace("```json", "").replace("```", "").strip()
+    verdicts = {}
+    for entry in json.loads(cleaned):
+        if isinstance(entry, dict) and entry.get("verdict") in ("pass", "fail"):
+            try:
+                verdicts[int(entry["id"])] = {k: v for k, v in entry.items() if k != "id"}
+            except (KeyError, TypeError, ValueError):
+                continue
+    return verdicts
+
+
+class VerifyBatcher:
+    """
+    VerifyBatcher: Merges verification calls from concurrent requests into one prompt.
+
+    A request thread queues its (question, search results, answer) and waits.
+    A dispatcher thread collects queued items for up to `max_wait_ms` or
+    `max_batch` items and sends them as one multi-item prompt that returns a
+    JSON array of verdicts; each verdict is handed back to its request.
+    A request gets None back when it should make its own single-item call:
+    it was alone in its batch, the batch call failed, or its verdict was
+    missing or unparseable.
+    """
+
+    def __init__(self, name: str, model, max_batch: int = 8, max_wait_ms: float = 5.0,
+                 max_inflight_batches: int = 4, timeout_s: float = 30.0):
+        self.name = name
+        self.model = model
+        self.max_batch = max_batch
+        self.max_wait_s = max_wait_ms / 1000
+        self.timeout_s = timeout_s
+
+        self.batches = 0
+        self.batched_items = 0
+        self.fallbacks = 0
+
+        self._cond = threading.Condition()
+        self._pending = []
+        self._senders = ThreadPoolExecutor(max_workers=max_inflight_batches, thread_name_prefix="verify-batch")
+        self._thread = threading.Thread(target=self._loop, name="verify-batcher", daemon=True)
+        self._thread.start()
+
+    def verify(self, user_input: str, search_result: str, final_answer: str) -> str:
+        """
+        Returns the verdict JSON for one answer, or None if the caller should
+        verify it with a single-item call.
+        """
+        job = VerifyJob({"user_input": user_input, "search_result": search_result, "final_answer": final_answer})
+        start = time.perf_counter()
+
+        with self._cond:
+            self._pending.append(job)
+            self._cond.notify()
+
+        if not job.done.wait(self.timeout_s) or job.verdict is None:
+            return None
+
+        # Attribute this request's share of the batch call to it
+        ctx = get_request()
+        if ctx is not None:
+            ctx.llm_calls.append({
+                "node": ctx.current_node,
+                "model": self.name,
+                "ok": True,
+                "prompt_tokens": job.prompt_tokens,
+                "output_tokens": job.output_tokens,
+                "ms": round((time.perf_counter() - start) * 1000, 3),
+                "batch_size": job.batch_size
+            })
+        return json.dumps(job.verdict)
+
+    def _loop(self):
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+
+                # The first item waits at most max_wait_s for others to join
+                deadline = time.monotonic() + self.max_wait_s
+                while len(self._pending) < self.max_batch:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+
+                batch = self._pending[:self.max_batch]
+                self._pending = self._pending[self.max_batch:]
+
+            if len(batch) == 1:
+                # Nothing to merge with; the request makes its usual call
+                batch[0].done.set()
+            else:
+                self._senders.submit(self._send, batch)
+
+    def _send(self, batch: list):
+        items = "\n".join(verify_batch_item.format(id=i, **job.item) for i, job in enumerate(batch, 1))
+        prompt = verify_batch_prompt.format(today=date.today().isoformat(), items=items)
+
+        verdicts, usage = {}, None
+        try:
+            response = self.model.generate_content(prompt)
+            usage = getattr(response, "usage_metadata", None)
+            verdicts = parse_batch_verdicts(response.text)
+        except Exception as e:
+            print(f"[WARN] Batched verification of {len(batch)} items failed: {e}")
+
+        with self._cond:
+            self.batches += 1
+            self.batched_items += len(batch)
+            self.fallbacks += sum(1 for i in range(1, len(batch) + 1) if i not in verdicts)
+
+        for i, job in enumerate(batch, 1):
+            job.verdict = verdicts.get(i)
+            job.batch_size = len(batch)
+            if job.verdict is not None and usage is not None:
+                job.prompt_tokens = (getattr(usage, "prompt_token_count", 0) or 0) // len(batch)
+                job.output_tokens = (getattr(usage, "candidates_token_count", 0) or 0) // len(batch)
+            job.done.set()
+
+    def stats(self) -> dict:
+        return {
+            "verify_batches": self.batches,
+            "verify_batched_items": self.batched_items,
+            "verify_batch_fallbacks": self.fallbacks
+        }
+
+
+def verify_batcher_from_env(name: str, model):
+    """
+    Builds the VerifyBatcher configured by AGENT_VERIFY_BATCH_SIZE, if above 1.
+    """
+    max_batch = int(os.getenv("AGENT_VERIFY_BATCH_SIZE", "1"))
+    if max_batch <= 1:
+        return None
+
+    max_wait_ms = float(os.getenv("AGENT_VERIFY_BATCH_WAIT_MS", "5"))
+    print(f"[INFO] Batching verification calls (up to {max_batch} items, {max_wait_ms} ms)")
+    return VerifyBatcher(name, model, max_batch=max_batch, max_wait_ms=max_wait_ms)
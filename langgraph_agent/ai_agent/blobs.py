@@ -0,0 +1,76 @@
+import itertools
+import sqlite3
+import threading
+import uuid
+
+
+class MemoryBlobStore:
+    """
+    MemoryBlobStore: Keeps large per-request payloads (search results) out of
+    AgentState. The state only carries short references; the payloads are
+    dropped when the request finishes.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._blobs = {}
+        self._seq = itertools.count()
+
+    def put(self, request_id: str, data: str) -> str:
+        ref = f"{request_id}/{next(self._seq)}"
+        with self._lock:
+            self._blobs.setdefault(request_id, {})[ref] = data
+        return ref
+
+    def get(self, ref: str) -> str:
+        request_id = ref.rsplit("/", 1)[0]
+        with self._lock:
+            return self._blobs[request_id][ref]
+
+    def release(self, request_id: str):
+        with self._lock:
+            self._blobs.pop(request_id, None)
+
+
+class SqliteBlobStore:
+    """
+    SqliteBlobStore: Same interface as MemoryBlobStore, but persisted next to
+    the checkpoints so a resumed request can still read its search results.
+    Blobs are deleted together with the request's checkpoints.
+    """
+
+    def __init__(self, conn: sqlite3.Connection, lock: threading.Lock):
+        self._conn = conn
+        self._lock = lock
+        with self._lock:
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS blobs (
+                    ref TEXT PRIMARY KEY,
+                    request_id TEXT NOT NULL,
+                    data TEXT NOT NULL
+                )
+                """
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS blobs_request ON blobs (request_id)")
+            self._conn.commit()
+
+    def put(self, request_id: str, data: str) -> str:
+        # Random suffix: refs must stay unique when a request resumes in a new process
+        ref = f"{request_id}/{uuid.uuid4().hex}"
+        with self._lock:
+            self._conn.execute("INSERT INTO blobs (ref, request_id, data) VALUES (?, ?, ?)", (ref, request_id, data))
+            self._conn.commit()
+        return ref
+
+    def get(self, ref: str) -> str:
+        with self._lock:
+            row = self._conn.execute("SELECT data FROM blobs WHERE ref = ?", (ref,)).fetchone()
+        if row is None:
+            raise KeyError(ref)
+        return row[0]
+
+    def release(self, request_id: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM blobs WHERE request_id = ?", (request_id,))
+            self._conn.commit()
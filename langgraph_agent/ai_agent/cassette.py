@@ -0,0 +1,235 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import deque
+from datetime import date
+
+from ai_agent.context import get_request
+
+
+class CassetteMiss(RuntimeError):
+    """
+    Raised in replay mode when no recorded call matches the request.
+    """
+
+
+class ReplayedError(RuntimeError):
+    """
+    Re-raises an error that was recorded from the live service.
+    """
+
+
+def _normalize(text: str, day: str) -> str:
+    # Prompts embed today's date; strip it so a recording replays on any day
+    return text.replace(day, "{today}")
+
+
+def call_key(kind: str, name: str, text: str, day: str) -> str:
+    payload = f"{kind}|{name}|{_normalize(text, day)}"
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+class Cassette:
+    """
+    Cassette: Append-only JSONL log of backend calls.
+
+    In "record" mode every call is appended as one compact JSON line.
+    In "replay" mode the file is indexed by call key and calls are served
+    from it, optionally sleeping for the recorded duration * time_scale.
+    """
+
+    def __init__(self, path: str, mode: str, time_scale: float = 1.0):
+        if mode not in ("record", "replay"):
+            raise ValueError(f"Unknown cassette mode: {mode}")
+
+        self.path = path
+        self.mode = mode
+        self.time_scale = time_scale
+        self._lock = threading.Lock()
+        self._index = {}
+        self.hits = 0
+        self.misses = 0
+        self.request_calls = {}
+
+        if mode == "record":
+            self._file = open(path, "a", encoding="utf-8")
+        else:
+            self._file = None
+            self._load()
+
+    def _load(self):
+        count = 0
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                entry = json.loads(line)
+                if entry.get("kind") == "request":
+                    continue
+                self._index.setdefault(entry["key"], deque()).append(entry)
+                count += 1
+        print(f"[INFO] Cassette loaded {count} recorded calls from {self.path}")
+
+    def write(self, entry: dict):
+        line = json.dumps(entry, separators=(",", ":"), default=str)
+        with self._lock:
+            self._file.write(line + "\n")
+            self._file.flush()
+
+    def record_request(self, request_id: str, user_input: str):
+        if self.mode == "record":
+            self.write({"kind": "request", "req": request_id, "input": user_input, "ts": time.time()})
+
+    def lookup(self, key: str) -> dict:
+        with self._lock:
+            entries = self._index.get(key)
+            if not entries:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            # Serve identical calls in recorded order, then keep serving the last one
+            if len(entries) > 1:
+                return entries.popleft()
+            return entries[0]
+
+    def call(self, kind: str, name: str, text: str, live_call):
+        """
+        Records or replays one backend call identified by (kind, name, text).
+        """
+        day = date.today().isoformat()
+        key = call_key(kind, name, text, day)
+        ctx = get_request()
+
+        # Per-request call counts are only needed when comparing replays
+        if ctx and self.mode == "replay":
+            with self._lock:
+                counts = self.request_calls.setdefault(ctx.request_id, {"llm": 0, "search": 0})
+                counts[kind] += 1
+
+        if self.mode == "replay":
+            entry = self.lookup(key)
+            if entry is None:
+                raise CassetteMiss(f"No recorded {kind} call for {name}")
+
+            if self.time_scale > 0:
+                time.sleep(entry["ms"] * self.time_scale / 1000)
+
+            if entry.get("error"):
+                raise ReplayedError(entry["error"])
+            return entry["output"]
+
+        start = time.perf_counter()
+        entry = {
+            "kind": kind,
+            "name": name,
+            "key": key,
+            "req": ctx.request_id if ctx else None,
+            "ts": time.time(),
+            "input": _normalize(text, day)
+        }
+        try:
+            output = live_call()
+            entry["output"] = output
+            return output
+
+        except Exception as e:
+            entry["error"] = f"{type(e).__name__}: {e}"
+            raise
+
+        finally:
+            entry["ms"] = round((time.perf_counter() - start) * 1000, 2)
+            self.write(entry)
+
+
+class CassetteUsage:
+    def __init__(self, prompt_tokens: int, output_tokens: int):
+        self.prompt_token_count = prompt_tokens
+        self.candidates_token_count = output_tokens
+        self.total_token_count = prompt_tokens + output_tokens
+
+
+class CassetteResponse:
+    def __init__(self, text: str, usage: list = None):
+        self.text = text
+        self.usage_metadata = CassetteUsage(*usage) if usage else None
+
+
+class CassetteModel:
+    """
+    CassetteModel: Wraps a GenerativeModel so generate_content goes through the cassette.
+    """
+
+    def __init__(self, cassette: Cassette, name: str, model):
+        self.cassette = cassette
+        self.model_name = name
+        self.model = model
+
+    def generate_content(self, prompt: str) -> CassetteResponse:
+
+        def live_call():
+            response = self.model.generate_content(prompt)
+            usage = getattr(response, "usage_metadata", None)
+            return {
+                "text": response.text,
+                "usage": [usage.prompt_token_count, usage.candidates_token_count] if usage else None
+            }
+
+        output = self.cassette.call("llm", self.model_name, prompt, live_call)
+        return CassetteResponse(output["text"], output.get("usage"))
+
+
+class CassetteSearchTool:
+    """
+    CassetteSearchTool: Wraps the search tool so run/results go through the cassette.
+    """
+
+    def __init__(self, cassette: Cassette, tool):
+        self.cassette = cassette
+        self.tool = tool
+
+    def run(self, query: str) -> str:
+        return self.cassette.call("search", "run", query, lambda: self.tool.run(query))
+
+    def results(self, query: str, max_results: int = None) -> list:
+        return self.cassette.call(
+            "search",
+            f"results:{max_results}",
+            query,
+            lambda: self.tool.results(query, max_results=max_results)
+        )
+
+
+class CassetteDeepReader:
+    """
+    CassetteDeepReader: Wraps the deep reader so page reads go through the cassette.
+    """
+
+    def __init__(self, cassette: Cassette, reader):
+        self.cassette = cassette
+        self.reader = reader
+
+    def read(self, query: str, urls: list) -> list:
+        return self.cassette.call(
+            "search",
+            "deep_read",
+            json.dumps([query, urls]),
+            lambda: self.reader.read(query, urls)
+        )
+
+
+def cassette_from_env():
+    """
+    Opens the cassette configured by AGENT_CASSETTE_MODE / AGENT_CASSETTE_PATH, if any.
+    """
+    mode = os.getenv("AGENT_CASSETTE_MODE", "off")
+    if mode == "off":
+        return None
+
+    path = os.getenv("AGENT_CASSETTE_PATH", "agent_calls.cassette.jsonl")
+    time_scale = float(os.getenv("AGENT_CASSETTE_TIME_SCALE", "1.0"))
+    print(f"[INFO] Cassette {mode} mode: {path}")
+    return Cassette(path, mode, time_scale)
@@ -0,0 +1,246 @@
+import importlib
+import os
+import sqlite3
+import threading
+import time
+
+from langgraph.checkpoint.memory import InMemorySaver
+from langgraph.checkpoint.sqlite import SqliteSaver
+
+from ai_agent.blobs import SqliteBlobStore
+
+
+class IdempotencyConflict(Exception):
+    """
+    Raised when an idempotency ID is reused for a different question.
+    """
+
+
+class RequestInProgress(IdempotencyConflict):
+    """
+    Raised when an idempotency ID is reused while its first run is still going.
+    """
+
+
+class CheckpointStore:
+    """
+    CheckpointStore: A LangGraph checkpointer plus a small request index.
+
+    The checkpointer persists AgentState after every node, keyed by thread_id
+    (the request's idempotency ID). The index records when each request was
+    last touched so finished requests can be compacted and old ones expired.
+    Large payloads referenced from the state live in `blobs`, in the same file.
+
+    A run claims its request while it executes. The claim is refreshed every
+    few seconds, so a second run with the same ID is refused while the first
+    is alive (in any process sharing the index), and allowed to resume once
+    the first has stopped or its process has not refreshed the claim for
+    `running_timeout_s`.
+    """
+
+    def __init__(self, saver, index_path: str, ttl_s: float = 86400, sweep_interval_s: float = 60,
+                 running_timeout_s: float = 30):
+        self.saver = saver
+        self.ttl_s = ttl_s
+        self.sweep_interval_s = sweep_interval_s
+        self.running_timeout_s = running_timeout_s
+        self._last_sweep = 0.0
+        self._lock = threading.Lock()
+        self._active = {}
+
+        self._index = sqlite3.connect(index_path, check_same_thread=False)
+        self._index.execute(
+            """
+            CREATE TABLE IF NOT EXISTS request_index (
+                thread_id TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                updated_at REAL NOT NULL,
+                latency_ms REAL
+            )
+            """
+        )
+        columns = {row[1] for row in self._index.execute("PRAGMA table_info(request_index)")}
+        if "latency_ms" not in columns:
+            self._index.execute("ALTER TABLE request_index ADD COLUMN latency_ms REAL")
+        self._index.commit()
+
+        self.blobs = SqliteBlobStore(self._index, self._lock)
+
+        threading.Thread(target=self._heartbeat, name="checkpoint-heartbeat", daemon=True).start()
+
+    def config(self, thread_id: str) -> dict:
+        return {"configurable": {"thread_id": thread_id}}
+
+    def mark(self, thread_id: str, status: str, latency_ms: float = None):
+        with self._lock:
+            self._index.execute(
+                """
+                INSERT INTO request_index (thread_id, status, updated_at, latency_ms) VALUES (?, ?, ?, ?)
+                ON CONFLICT (thread_id) DO UPDATE SET
+                    status = excluded.status,
+                    updated_at = excluded.updated_at,
+                    latency_ms = COALESCE(excluded.latency_ms, latency_ms)
+                """,
+                (thread_id, status, time.time(), latency_ms)
+            )
+            self._index.commit()
+
+    def claim(self, thread_id: str, owner) -> bool:
+        """
+        Marks a request as running on behalf of `owner`. Returns False if a
+        live run already holds it.
+        """
+        with self._lock:
+            if thread_id in self._active:
+                return False
+
+            # IMMEDIATE takes the write lock up front, so two processes cannot both claim
+            self._index.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._index.execute(
+                    "SELECT status, updated_at FROM request_index WHERE thread_id = ?", (thread_id,)
+                ).fetchone()
+                if row and row[0] == "running" and time.time() - row[1] < self.running_timeout_s:
+                    self._index.rollback()
+                    return False
+
+                self._index.execute(
+                    """
+                    INSERT INTO request_index (thread_id, status, updated_at) VALUES (?, 'running', ?)
+                    ON CONFLICT (thread_id) DO UPDATE SET status = 'running', updated_at = excluded.updated_at
+                    """,
+                    (thread_id, time.time())
+                )
+                self._index.commit()
+            except Exception:
+                self._index.rollback()
+                raise
+
+            self._active[thread_id] = owner
+        return True
+
+    def release(self, thread_id: str, owner):
+        """
+        Drops `owner`'s claim. A run that stopped before finishing is marked
+        "interrupted", so a retry can resume it right away.
+        """
+        with self._lock:
+            if self._active.get(thread_id) is not owner:
+                return
+            del self._active[thread_id]
+
+            self._index.execute(
+                "UPDATE request_index SET status = 'interrupted', updated_at = ? WHERE thread_id = ? AND status = 'running'",
+                (time.time(), thread_id)
+            )
+            self._index.commit()
+
+    def running(self, thread_id: str) -> bool:
+        with self._lock:
+            if thread_id in self._active:
+                return True
+            row = self._index.execute(
+                "SELECT status, updated_at FROM request_index WHERE thread_id = ?", (thread_id,)
+            ).fetchone()
+        return bool(row) and row[0] == "running" and time.time() - row[1] < self.running_timeout_s
+
+    def latency_ms(self, thread_id: str):
+        with self._lock:
+            row = self._index.execute("SELECT latency_ms FROM request_index WHERE thread_id = ?", (thread_id,)).fetchone()
+        return row[0] if row else None
+
+    def _heartbeat(self):
+        # Keeps this process's claims fresh; a crashed process stops refreshing them
+        while True:
+            time.sleep(self.running_timeout_s / 3)
+            with self._lock:
+                if not self._active:
+                    continue
+                self._index.executemany(
+                    "UPDATE request_index SET updated_at = ? WHERE thread_id = ? AND status = 'running'",
+                    [(time.time(), thread_id) for thread_id in self._active]
+                )
+                self._index.commit()
+
+    def finish(self, thread_id: str, latency_ms: float = None):
+        """
+        Marks a request as done, keeps only its final checkpoint and
+        occasionally expires old requests.
+        """
+        self.mark(thread_id, "done", latency_ms)
+        self.compact(thread_id)
+
+        if time.time() - self._last_sweep > self.sweep_interval_s:
+            self.expire()
+
+    def compact(self, thread_id: str):
+        # Intermediate checkpoints are only needed to resume; drop them once a
+        # request has finished. Only the SQLite backend supports this.
+        if not isinstance(self.saver, SqliteSaver):
+            return
+
+        with self.saver.cursor() as cur:
+            cur.execute(
+                "SELECT MAX(checkpoint_id) FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ''",
+                (thread_id,)
+            )
+            row = cur.fetchone()
+            if not row or row[0] is None:
+                return
+
+            cur.execute("DELETE FROM checkpoints WHERE thread_id = ? AND checkpoint_id != ?", (thread_id, row[0]))
+            cur.execute("DELETE FROM writes WHERE thread_id = ? AND checkpoint_id != ?", (thread_id, row[0]))
+
+    def expire(self) -> int:
+        """
+        Deletes every request not touched within the TTL. Returns how many were removed.
+        """
+        self._last_sweep = time.time()
+        cutoff = time.time() - self.ttl_s
+
+        with self._lock:
+            rows = self._index.execute(
+                "SELECT thread_id FROM request_index WHERE updated_at < ?", (cutoff,)
+            ).fetchall()
+
+        for (thread_id,) in rows:
+            self.saver.delete_thread(thread_id)
+            self.blobs.release(thread_id)
+
+        with self._lock:
+            self._index.executemany("DELETE FROM request_index WHERE thread_id = ?", rows)
+            self._index.commit()
+
+        if rows:
+            print(f"[INFO] Expired {len(rows)} checkpointed request(s)")
+        return len(rows)
+
+
+def _load_saver(backend: str, db_path: str):
+    if backend == "sqlite":
+        conn = sqlite3.connect(db_path, check_same_thread=False)
+        return SqliteSaver(conn)
+
+    if backend == "memory":
+        return InMemorySaver()
+
+    # Any other value is "package.module:factory" returning a BaseCheckpointSaver
+    module_name, _, factory_name = backend.partition(":")
+    factory = getattr(importlib.import_module(module_name), factory_name)
+    return factory()
+
+
+def checkpoint_store_from_env():
+    """
+    Builds the CheckpointStore configured by AGENT_CHECKPOINT_DB, if any.
+    """
+    db_path = os.getenv("AGENT_CHECKPOINT_DB")
+    if not db_path:
+        return None
+
+    backend = os.getenv("AGENT_CHECKPOINT_BACKEND", "sqlite")
+    ttl_s = float(os.getenv("AGENT_CHECKPOINT_TTL_S", "86400"))
+    running_timeout_s = float(os.getenv("AGENT_CHECKPOINT_RUNNING_TIMEOUT_S", "30"))
+
+    print(f"[INFO] Checkpointing enabled ({backend}): {db_path}")
+    return CheckpointStore(_load_saver(backend, db_path), db_path, ttl_s=ttl_s, running_timeout_s=running_timeout_s)
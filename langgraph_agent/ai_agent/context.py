@@ -0,0 +1,53 @@
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+
+class RequestContext:
+    """
+    RequestContext: Identity of one graph invocation, plus what happened
+    during it (node timings, model and search calls) for tracing.
+    """
+
+    def __init__(self, user_input: str, request_id: str = None):
+        self.request_id = request_id or uuid.uuid4().hex
+        # Blobs are stored under this run's own ID; only a checkpointed run,
+        # which holds the claim on its request ID, stores them under that ID
+        self.blob_namespace = uuid.uuid4().hex
+        self.user_input = user_input
+        self.started_at = time.time()
+        self.current_node = None
+        # Record of the running node; worker threads add their CPU time to it
+        self.current_record = None
+        self.nodes = []
+        self.llm_calls = []
+        self.search_calls = 0
+        self.retry_actions = []
+        self.profile = None
+        self.variant = None
+        self.shadow = False
+        # Futures of work that outlives its node but whose calls belong to this request
+        self.pending = []
+        self.lock = threading.Lock()
+
+
+current_request = ContextVar("current_request", default=None)
+
+
+@contextmanager
+def request_scope(user_input: str, request_id: str = None):
+    """
+    Makes a RequestContext visible to every node and backend call of one request.
+    """
+    ctx = RequestContext(user_input, request_id)
+    token = current_request.set(ctx)
+    try:
+        yield ctx
+    finally:
+        current_request.reset(token)
+
+
+def get_request() -> RequestContext:
+    return current_request.get()
@@ -26,8 +26,13 @@ Do NOT add explanations, text, or formatting
 
 Respond ONLY in valid JSON.
 
+If the question asks several independent things (e.g. about different
+people, companies or events), add "sub_queries": one short web search query
+per part, each understandable on its own. Omit "sub_queries" otherwise.
+
 Allowed formats:
 {{ "action": "SEARCH", "reason" : "<why search is required>" }}
+{{ "action": "SEARCH", "reason" : "<why search is required>", "sub_queries": ["<search query>", "<search query>"] }}
 {{ "action": "ANSWER", "reason" : "<why direct answer is safe>", "content": "<direct answer>" }}
 
 User question:
@@ -61,10 +66,15 @@ IMPORTANT OUTPUT RULES:
 - Do NOT include the word "json" or fences, backticks
 - Do NOT add explanations, text, or formatting
 
+If the question asks several independent things, add "sub_queries":
+one short search query per part. Otherwise leave it out.
+
 Allowed responses (exact format):
 
 {{ "action": "SEARCH", "reason" : "<why search is required>" }}
 
+{{ "action": "SEARCH", "reason" : "<why search is required>", "sub_queries": ["<search query>", "<search query>"] }}
+
 {{ "action": "ANSWER", "reason" : "<why direct answer is safe>", "content": "<direct answer>" }}
 
 User question:
@@ -0,0 +1,101 @@
+import re
+
+
+QUESTION_STARTS = (
+    "who", "what", "when", "where", "which", "why", "how",
+    "is", "are", "was", "were", "do", "does", "did", "can", "could"
+)
+
+# " and " / ", " / "; " directly followed by a new question word may start a new part
+PART_BOUNDARY = re.compile(
+    r"(\s*(?:[;,]\s*(?:and\s+)?|\s+and\s+))(?=(?:" + "|".join(QUESTION_STARTS) + r")\b)",
+    re.IGNORECASE
+)
+
+# After a bare comma these usually start a relative clause ("Acme, which makes anvils"),
+# so they only start a new question when followed by an auxiliary ("..., when was it founded")
+RELATIVE_STARTS = {"who", "which", "where", "when"}
+AUXILIARIES = {
+    "is", "are", "was", "were", "do", "does", "did", "can", "could",
+    "will", "would", "has", "have", "had", "should"
+}
+
+# A later part that refers back to an earlier one cannot be searched on its own
+BACK_REFERENCES = {"it", "its", "they", "them", "their", "he", "him", "his", "she", "her", "there", "that", "this"}
+
+
+def starts_question(part: str, separator: str = "") -> bool:
+    words = part.lower().split()
+    if len(words) < 2 or words[0] not in QUESTION_STARTS:
+        return False
+    if separator.strip() == "," and words[0] in RELATIVE_STARTS:
+        return words[1] in AUXILIARIES
+    return True
+
+
+def split_sentence(sentence: str) -> list:
+    """
+    Splits one sentence at its part boundaries, or returns it whole unless
+    every part is a question of its own.
+    """
+    pieces = PART_BOUNDARY.split(sentence)
+    parts = [pieces[0].strip(" ,;")]
+    for separator, part in zip(pieces[1::2], pieces[2::2]):
+        part = part.strip(" ,;")
+        if not starts_question(part, separator):
+            return [sentence.strip(" ,;")]
+        parts.append(part)
+
+    # "In 2020, who won ..." or "Tell me, what is ..." is one question
+    if len(parts) > 1 and not starts_question(parts[0]):
+        return [sentence.strip(" ,;")]
+    return parts
+
+
+def split_question(user_input: str) -> list:
+    """
+    Splits a compound question into its independent parts without an LLM call.
+
+    Parts are separated by "?" or by "and" / "," / ";" followed by a new
+    question word, e.g. "Who is the CEO of X and when was Y founded?".
+    A sentence is only split if every part starts with a question word, so
+    "In 2020, who won the election?" stays whole. A single question, or one
+    whose later parts refer back to earlier ones ("... and where was it
+    held?"), is returned as a one-item list.
+    """
+    parts = []
+    for sentence in re.split(r"\?+", user_input):
+        for part in split_sentence(sentence):
+            if len(part.split()) >= 2:
+                parts.append(part)
+
+    for part in parts[1:]:
+        if BACK_REFERENCES & {w.lower() for w in re.findall(r"[\w']+", part)}:
+            return [user_input.strip()]
+
+    return parts or [user_input.strip()]
+
+
+def plan_sub_queries(decision: dict, user_input: str, max_sub_queries: int, heuristic: bool = False) -> list:
+    """
+    Returns the search queries for a question: the decision model's
+    `sub_queries` if it gave usable ones. The heuristic split is only used
+    with `heuristic=True` (no decision model answered); a model that omitted
+    `sub_queries` judged the question to be a single one.
+    Duplicates are dropped and at most `max_sub_queries` are kept.
+    """
+    proposed = decision.get("sub_queries")
+    if isinstance(proposed, list):
+        queries = [q.strip() for q in proposed if isinstance(q, str) and q.strip()]
+    else:
+        queries = []
+
+    if not queries and heuristic:
+        queries = split_question(user_input)
+
+    unique = []
+    for query in queries:
+        if query.lower() not in (q.lower() for q in unique):
+            unique.append(query)
+
+    return unique[:max_sub_queries]
@@ -0,0 +1,324 @@
+import asyncio
+import atexit
+import codecs
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from html.parser import HTMLParser
+
+import httpx
+
+
+# Elements whose text is never part of the main content
+SKIP_TAGS = {"script", "style", "noscript", "svg", "nav", "header", "footer", "aside", "form", "iframe", "template", "button"}
+
+# Elements that end a block of text
+BLOCK_TAGS = {
+    "p", "div", "li", "ul", "ol", "section", "article", "main", "blockquote", "pre",
+    "h1", "h2", "h3", "h4", "h5", "h6", "tr", "td", "th", "table", "br", "dd", "dt"
+}
+
+STOPWORDS = {
+    "the", "and", "for", "are", "was", "were", "who", "what", "when", "where", "which", "why", "how",
+    "does", "did", "is", "of", "in", "on", "to", "a", "an", "it", "its", "with", "from", "about", "tell", "me"
+}
+
+
+class TextExtractor(HTMLParser):
+    """
+    TextExtractor: Incremental HTML-to-text parser. Fed chunk by chunk as the
+    page downloads; keeps blocks of visible text long enough to be content
+    (navigation, scripts and one-word labels are dropped).
+    """
+
+    def __init__(self, min_block_chars: int = 60):
+        super().__init__(convert_charrefs=True)
+        self.min_block_chars = min_block_chars
+        self.blocks = []
+        self._skip_depth = 0
+        self._current = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag in SKIP_TAGS:
+            self._skip_depth += 1
+        elif tag in BLOCK_TAGS:
+            self._flush()
+
+    def handle_endtag(self, tag):
+        if tag in SKIP_TAGS:
+            self._skip_depth = max(self._skip_depth - 1, 0)
+        elif tag in BLOCK_TAGS:
+            self._flush()
+
+    def handle_data(self, data):
+        if not self._skip_depth:
+            self._current.append(data)
+
+    def _flush(self):
+        text = " ".join("".join(self._current).split())
+        if len(text) >= self.min_block_chars:
+            self.blocks.append(text)
+        self._current = []
+
+    def close(self):
+        super().close()
+        self._flush()
+
+
+def query_terms(text: str) -> set:
+    return {w for w in re.findall(r"\w+", text.lower()) if len(w) > 2 and w not in STOPWORDS}
+
+
+def split_passages(blocks: list, max_chars: int = 600) -> list:
+    """
+    Cuts text blocks into passages of at most `max_chars`, on sentence boundaries.
+    """
+    passages = []
+    for block in blocks:
+        current = ""
+        for sentence in re.split(r"(?<=[.!?])\s+", block):
+            if current and len(current) + len(sentence) + 1 > max_chars:
+                passages.append(current)
+                current = ""
+            current = f"{current} {sentence}".strip()
+        if current:
+            passages.append(current[:max_chars])
+    return passages
+
+
+def relevant_passages(query: str, pages: list, max_passages: int) -> list:
+    """
+    Ranks the passages of all pages by how many query terms they contain and
+    returns the best `max_passages` as (url, passage) pairs.
+    """
+    terms = query_terms(query)
+    if not terms:
+        return []
+
+    # One matching term is enough for short queries, longer ones need two
+    min_score = 1 if len(terms) <= 3 else 2
+
+    scored = []
+    seen = set()
+    for page_rank, (url, blocks) in enumerate(pages):
+        for position, passage in enumerate(split_passages(blocks)):
+            if passage in seen:
+                continue
+            seen.add(passage)
+
+            score = len(terms & query_terms(passage))
+            if score >= min_score:
+                # Ties go to higher-ranked pages and earlier passages
+                scored.append((-score, page_rank, position, url, passage))
+
+    scored.sort()
+    return [(url, passage) for _, _, _, url, passage in scored[:max_passages]]
+
+
+class PageCache:
+    """
+    PageCache: LRU cache of extracted pages keyed by URL.
+
+    Entries younger than `max_age_s` are served without a request; older ones
+    are revalidated with their ETag / Last-Modified and reused on a 304.
+    Only touched from the reader's event loop thread, so it needs no lock.
+    """
+
+    def __init__(self, max_entries: int = 256, max_age_s: float = 600):
+        self.max_entries = max_entries
+        self.max_age_s = max_age_s
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.revalidated = 0
+
+    def get(self, url: str) -> dict:
+        entry = self._entries.get(url)
+        if entry is not None:
+            self._entries.move_to_end(url)
+        return entry
+
+    def fresh(self, entry: dict) -> bool:
+        return time.time() - entry["fetched_at"] < self.max_age_s
+
+    def put(self, url: str, blocks: list, etag: str = None, last_modified: str = None):
+        self._entries[url] = {"blocks": blocks, "etag": etag, "last_modified": last_modified, "fetched_at": time.time()}
+        self._entries.move_to_end(url)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def touch(self, url: str):
+        self._entries[url]["fetched_at"] = time.time()
+
+
+class DeepReader:
+    """
+    DeepReader: Fetches the top search hits and returns their most relevant passages.
+
+    All pages are fetched concurrently by one pooled async HTTP client running
+    on a background event loop, shared by every request. Each page is limited
+    by `page_timeout_s` and `max_bytes` (the download stops at the cap and the
+    part read so far is used); the whole read is limited by `deadline_s`, after
+    which unfinished fetches are cancelled and only completed pages are used.
+    """
+
+    def __init__(self, max_pages: int = 3, page_timeout_s: float = 3.0, deadline_s: float = 5.0,
+                 max_bytes: int = 512 * 1024, max_passages: int = 6, cache: PageCache = None,
+                 max_connections: int = 64):
+        self.max_pages = max_pages
+        self.page_timeout_s = page_timeout_s
+        self.deadline_s = deadline_s
+        self.max_bytes = max_bytes
+        self.max_passages = max_passages
+        self.max_connections = max_connections
+        self.cache = cache or PageCache()
+
+        self._lock = threading.Lock()
+        self._loop = None
+        self._client = None
+        self._inflight = {}
+
+    def _ensure_loop(self):
+        with self._lock:
+            if self._loop is not None:
+                return
+
+            self._loop = asyncio.new_event_loop()
+            threading.Thread(target=self._loop.run_forever, name="deep-read", daemon=True).start()
+
+            async def make_client():
+                return httpx.AsyncClient(
+                    follow_redirects=True,
+                    timeout=self.page_timeout_s,
+                    limits=httpx.Limits(max_connections=self.max_connections, max_keepalive_connections=self.max_connections),
+                    headers={"User-Agent": "Mozilla/5.0 (compatible; ai-agent-deep-read)"}
+                )
+
+            self._client = asyncio.run_coroutine_threadsafe(make_client(), self._loop).result()
+
+    async def _fetch(self, url: str) -> list:
+        # Concurrent requests for the same page share one download
+        task = self._inflight.get(url)
+        if task is None:
+            task = asyncio.ensure_future(asyncio.wait_for(self._download(url), self.page_timeout_s))
+            self._inflight[url] = task
+            task.add_done_callback(lambda done: self._forget(url, done))
+
+        # A caller hitting its deadline must not cancel the download for the others;
+        # a download that finishes late still fills the cache
+        return await asyncio.shield(task)
+
+    def _forget(self, url: str, task: asyncio.Future):
+        self._inflight.pop(url, None)
+        if not task.cancelled():
+            # Mark the error as handled even if every caller has gone
+            task.exception()
+
+    async def _download(self, url: str) -> list:
+        cached = self.cache.get(url)
+        if cached is not None and self.cache.fresh(cached):
+            self.cache.hits += 1
+            return cached["blocks"]
+
+        headers = {}
+        if cached is not None:
+            if cached["etag"]:
+                headers["If-None-Match"] = cached["etag"]
+            if cached["last_modified"]:
+                headers["If-Modified-Since"] = cached["last_modified"]
+
+        async with self._client.stream("GET", url, headers=headers) as response:
+            if response.status_code == 304 and cached is not None:
+                self.cache.revalidated += 1
+                self.cache.touch(url)
+                return cached["blocks"]
+
+            response.raise_for_status()
+            content_type = response.headers.get("content-type", "")
+            if "html" not in content_type and "text/plain" not in content_type:
+                return []
+
+            decoder = codecs.getincrementaldecoder(response.encoding or "utf-8")(errors="replace")
+            extractor = TextExtractor()
+            received = 0
+            async for chunk in response.aiter_bytes():
+                chunk = chunk[:self.max_bytes - received]
+                received += len(chunk)
+                extractor.feed(decoder.decode(chunk))
+                if received >= self.max_bytes:
+                    break
+
+            extractor.feed(decoder.decode(b"", final=True))
+            extractor.close()
+
+            self.cache.put(url, extractor.blocks, response.headers.get("etag"), response.headers.get("last-modified"))
+            return extractor.blocks
+
+    async def _read(self, urls: list) -> list:
+        tasks = {asyncio.ensure_future(self._fetch(url)): url for url in urls}
+        done, pending = await asyncio.wait(tasks, timeout=self.deadline_s)
+        for task in pending:
+            task.cancel()
+
+        pages = []
+        for task, url in tasks.items():
+            if task not in done:
+                print(f"[WARN] Deep read skipped {url}: deadline reached")
+            elif task.exception() is not None:
+                print(f"[WARN] Deep read failed for {url}: {type(task.exception()).__name__} {task.exception()}")
+            else:
+                pages.append((url, task.result()))
+        return pages
+
+    def read(self, query: str, urls: list) -> list:
+        """
+        Fetches up to `max_pages` of `urls` and returns the passages most
+        relevant to `query` as [{"url", "text"}], best first.
+        """
+        urls = [u for u in dict.fromkeys(urls) if u.startswith(("http://", "https://"))][:self.max_pages]
+        if not urls:
+            return []
+
+        self._ensure_loop()
+        future = asyncio.run_coroutine_threadsafe(self._read(urls), self._loop)
+        pages = future.result(timeout=self.deadline_s + 1)
+
+        return [{"url": url, "text": text} for url, text in relevant_passages(query, pages, self.max_passages)]
+
+    def close(self):
+        if self._loop is None:
+            return
+        asyncio.run_coroutine_threadsafe(self._client.aclose(), self._loop).result(timeout=5)
+        self._loop.call_soon_threadsafe(self._loop.stop)
+
+
+def format_passages(passages: list) -> str:
+    """
+    Formats deep-read passages for synthesis, each labelled with its source.
+    """
+    return "\n\n".join(f"[Source: {p['url']}]\n{p['text']}" for p in passages)
+
+
+def deep_reader_from_env():
+    """
+    Builds the DeepReader configured by AGENT_DEEP_READ, if enabled.
+    """
+    if os.getenv("AGENT_DEEP_READ", "0") != "1":
+        return None
+
+    reader = DeepReader(
+        max_pages=int(os.getenv("AGENT_DEEP_READ_PAGES", "3")),
+        page_timeout_s=float(os.getenv("AGENT_DEEP_READ_PAGE_TIMEOUT_S", "3")),
+        deadline_s=float(os.getenv("AGENT_DEEP_READ_DEADLINE_S", "5")),
+        max_bytes=int(os.getenv("AGENT_DEEP_READ_MAX_KB", "512")) * 1024,
+        max_passages=int(os.getenv("AGENT_DEEP_READ_PASSAGES", "6")),
+        cache=PageCache(
+            max_entries=int(os.getenv("AGENT_DEEP_READ_CACHE_SIZE", "256")),
+            max_age_s=float(os.getenv("AGENT_DEEP_READ_CACHE_TTL_S", "600"))
+        )
+    )
+    print(f"[INFO] Deep read enabled (top {reader.max_pages} pages, {reader.deadline_s}s deadline)")
+
+    atexit.register(reader.close)
+    return reader
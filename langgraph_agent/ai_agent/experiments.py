@@ -0,0 +1,249 @@
+import hashlib
+import json
+import os
+import threading
+from collections import deque
+
+from ai_agent.context import get_request
+
+
+# Overrides a variant may set. Graph topology (e.g. deep read) is fixed when
+# the graph is compiled, so only options read while a node runs are allowed.
+OVERRIDE_KEYS = {
+    "decision_models",
+    "synthesis_models",
+    "verify_models",
+    "prompts",
+    "max_retries",
+    "max_sub_queries"
+}
+
+# Prompts a variant may replace (the names used in the prompt modules)
+PROMPT_NAMES = {
+    "decision_prompt_flash",
+    "decision_prompt_gemma",
+    "synthesis_prompt_flash",
+    "synthesis_prompt_gemma",
+    "verify_prompt"
+}
+
+
+class Variant:
+    def __init__(self, name: str, weight: float = 1.0, overrides: dict = None):
+        unknown = set(overrides or {}) - OVERRIDE_KEYS
+        if unknown:
+            raise ValueError(f"Variant {name}: unknown override(s) {sorted(unknown)}")
+
+        unknown = set((overrides or {}).get("prompts", {})) - PROMPT_NAMES
+        if unknown:
+            raise ValueError(f"Variant {name}: unknown prompt(s) {sorted(unknown)}")
+
+        self.name = name
+        self.weight = weight
+        self.overrides = overrides or {}
+
+
+class VariantStats:
+    """
+    VariantStats: Running outcome, cost and latency figures for one variant.
+    Latency percentiles are computed over the most recent `window` requests.
+    """
+
+    def __init__(self, window: int = 10000):
+        self.requests = 0
+        self.passes = 0
+        self.aborts = 0
+        self.llm_calls = 0
+        self.prompt_tokens = 0
+        self.output_tokens = 0
+        self.cost = 0.0
+        self.latencies = deque(maxlen=window)
+
+    def add(self, record: dict, cost: float):
+        self.requests += 1
+        self.passes += record["outcome"] == "pass"
+        self.aborts += record["outcome"] == "abort"
+        self.llm_calls += record["llm_calls"]
+        self.prompt_tokens += record["prompt_tokens"]
+        self.output_tokens += record["output_tokens"]
+        self.cost += cost
+        if record.get("latency_ms") is not None:
+            self.latencies.append(record["latency_ms"])
+
+    def report(self) -> dict:
+        n = self.requests or 1
+        latencies = sorted(self.latencies)
+
+        def percentile(pct):
+            if not latencies:
+                return None
+            return latencies[min(len(latencies) - 1, int(pct / 100 * len(latencies)))]
+
+        return {
+            "requests": self.requests,
+            "latency_ms": {"p50": percentile(50), "p90": percentile(90), "p99": percentile(99)},
+            "llm_calls_per_request": round(self.llm_calls / n, 3),
+            "prompt_tokens_per_request": round(self.prompt_tokens / n, 1),
+            "output_tokens_per_request": round(self.output_tokens / n, 1),
+            "cost_per_request": round(self.cost / n, 8),
+            "pass_rate": round(self.passes / n, 4),
+            "abort_rate": round(self.aborts / n, 4)
+        }
+
+
+class Experiment:
+    """
+    Experiment: Splits traffic between variants and compares them.
+
+    Each request is assigned by hashing the experiment name with its key (the
+    question), so a question always gets the same variant, also when a
+    checkpointed request resumes. A shadow variant additionally runs, off the
+    hot path, on a sampled share of requests; its answers are never returned
+    and its results are reported separately.
+    """
+
+    def __init__(self, name: str, variants: list, shadow: Variant = None, shadow_rate: float = 0.0, prices: dict = None):
+        if not variants:
+            raise ValueError(f"Experiment {name} has no variants")
+
+        self.name = name
+        self.variants = variants
+        self.shadow = shadow
+        self.shadow_rate = shadow_rate
+        self.prices = prices or {}
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def _bucket(self, salt: str, key: str) -> float:
+        digest = hashlib.sha256(f"{self.name}:{salt}:{key}".encode("utf-8")).hexdigest()
+        return int(digest[:15], 16) / 16 ** 15
+
+    def assign(self, key: str) -> Variant:
+        point = self._bucket("assign", key) * sum(v.weight for v in self.variants)
+        for variant in self.variants:
+            point -= variant.weight
+            if point < 0:
+                return variant
+        return self.variants[-1]
+
+    def shadow_for(self, key: str) -> Variant:
+        """
+        Returns the shadow variant if this request is sampled for a shadow run.
+        """
+        if self.shadow is None or self._bucket("shadow", key) >= self.shadow_rate:
+            return None
+        return self.shadow
+
+    def cost_of(self, llm_calls: list) -> float:
+        # prices: {"flash": [USD per 1M prompt tokens, USD per 1M output tokens], ...}
+        cost = 0.0
+        for call in llm_calls:
+            prompt_price, output_price = self.prices.get(call["model"], (0.0, 0.0))
+            cost += (call["prompt_tokens"] * prompt_price + call["output_tokens"] * output_price) / 1_000_000
+        return cost
+
+    def record(self, variant: Variant, record: dict, llm_calls: list, shadow: bool = False):
+        label = f"shadow:{variant.name}" if shadow else variant.name
+        with self._lock:
+            self._stats.setdefault(label, VariantStats()).add(record, self.cost_of(llm_calls))
+
+    def report(self) -> dict:
+        with self._lock:
+            variants = {label: stats.report() for label, stats in sorted(self._stats.items())}
+        return {
+            "experiment": self.name,
+            "weights": {v.name: v.weight for v in self.variants},
+            "shadow": {"variant": self.shadow.name, "rate": self.shadow_rate} if self.shadow else None,
+            "variants": variants
+        }
+
+
+def current_overrides() -> dict:
+    ctx = get_request()
+    if ctx is None or ctx.variant is None:
+        return {}
+    return ctx.variant.overrides
+
+
+def experiment_chain(stage: str, models: list) -> list:
+    """
+    Reorders / filters a node's (name, model, ...) fallback chain by the
+    variant's `<stage>_models` list. Unknown names are ignored.
+    """
+    names = current_overrides().get(f"{stage}_models")
+    if not names:
+        return models
+
+    by_name = {entry[0]: entry for entry in models}
+    return [by_name[name] for name in names if name in by_name] or models
+
+
+def experiment_prompt(name: str, default: str) -> str:
+    return current_overrides().get("prompts", {}).get(name, default)
+
+
+def experiment_option(name: str, default):
+    return current_overrides().get(name, default)
+
+
+def _load_prompts(prompts: dict, base_dir: str) -> dict:
+    # "@file.txt" values are read from a file next to the experiment config
+    loaded = {}
+    for name, text in (prompts or {}).items():
+        if text.startswith("@"):
+            with open(os.path.join(base_dir, text[1:]), encoding="utf-8") as f:
+                text = f.read()
+        loaded[name] = text
+    return loaded
+
+
+def load_experiment(path: str) -> Experiment:
+    """
+    Loads an experiment from a JSON file:
+
+    {
+      "name": "lite-decision",
+      "variants": {
+        "control": {"weight": 50},
+        "lite": {"weight": 50, "decision_models": ["flash_lite", "flash", "gemma"]}
+      },
+      "shadow": {
+        "name": "short-synthesis",
+        "variant": {"prompts": {"synthesis_prompt_flash": "@short.txt"}},
+        "rate": 0.05
+      },
+      "prices": {"flash": [0.3, 2.5]}
+    }
+    """
+    with open(path, encoding="utf-8") as f:
+        config = json.load(f)
+    base_dir = os.path.dirname(os.path.abspath(path))
+
+    def build(name, spec):
+        overrides = {k: v for k, v in spec.items() if k != "weight"}
+        if "prompts" in overrides:
+            overrides["prompts"] = _load_prompts(overrides["prompts"], base_dir)
+        return Variant(name, float(spec.get("weight", 1.0)), overrides)
+
+    variants = [build(name, spec) for name, spec in config["variants"].items()]
+
+    shadow, shadow_rate = None, 0.0
+    if config.get("shadow"):
+        shadow = build(config["shadow"].get("name", "shadow"), config["shadow"].get("variant", {}))
+        shadow_rate = float(config["shadow"].get("rate", 0.0))
+
+    return Experiment(config.get("name", "experiment"), variants, shadow, shadow_rate, config.get("prices"))
+
+
+def experiment_from_env():
+    """
+    Loads the experiment configured by AGENT_EXPERIMENT, if any.
+    """
+    path = os.getenv("AGENT_EXPERIMENT")
+    if not path:
+        return None
+
+    experiment = load_experiment(path)
+    print(f"[INFO] Experiment {experiment.name}: variants {[v.name for v in experiment.variants]}"
+          + (f", shadow at {experiment.shadow_rate:.0%}" if experiment.shadow else ""))
+    return experiment
@@ -0,0 +1,202 @@
+import cProfile
+import json
+import os
+import pstats
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+
+
+class SamplingSession:
+    """
+    SamplingSession: Samples the stack of every thread running one of the
+    request's nodes at a fixed interval.
+
+    Samples include time spent waiting on the network, so the result shows
+    wall time. Each stack is rooted at "node:<name>" and written in the
+    collapsed format read by flamegraph.pl, speedscope and inferno.
+    """
+
+    extension = "collapsed"
+
+    def __init__(self, request_id: str, interval_s: float):
+        self.interval_s = interval_s
+        self.samples = 0
+        self._threads = {}
+        self._stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._loop, name=f"profiler-{request_id[:8]}", daemon=True)
+        self._thread.start()
+
+    @contextmanager
+    def node(self, name: str):
+        ident = threading.get_ident()
+        self._threads[ident] = name
+        try:
+            yield
+        finally:
+            self._threads.pop(ident, None)
+
+    def _loop(self):
+        while not self._stop.wait(self.interval_s):
+            if not self._threads:
+                continue
+
+            frames = sys._current_frames()
+            for ident, name in list(self._threads.items()):
+                frame = frames.get(ident)
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+
+                stack.append(f"node:{name}")
+                self._stacks[";".join(reversed(stack))] += 1
+                self.samples += 1
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def dump(self, path: str):
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in self._stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+class CProfileSession:
+    """
+    CProfileSession: Deterministic cProfile of the request's nodes.
+
+    cProfile only sees the thread it is enabled in, so a profiler is switched
+    on around each node in the node's own thread, and around the work the node
+    hands to worker threads; they are merged when the profile is written.
+    It counts every call, which
+    makes it the better choice for CPU-side overhead (prompt formatting, JSON
+    cleanup, client marshalling) but slows the request down noticeably.
+    The .prof file opens with pstats, snakeviz or flameprof.
+    """
+
+    extension = "prof"
+
+    def __init__(self, request_id: str):
+        self.samples = 0
+        self._lock = threading.Lock()
+        self._profiles = []
+
+    @contextmanager
+    def node(self, name: str):
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # Another profiler is already active in this thread
+            yield
+            return
+
+        try:
+            yield
+        finally:
+            profile.disable()
+            with self._lock:
+                self._profiles.append(profile)
+
+    def stop(self):
+        pass
+
+    def dump(self, path: str):
+        with self._lock:
+            profiles = list(self._profiles)
+        if not profiles:
+            profiles = [cProfile.Profile()]
+        pstats.Stats(*profiles).dump_stats(path)
+
+
+class Profiler:
+    """
+    Profiler: Decides which requests are profiled and writes their profiles.
+
+    A request is profiled when the caller asks for it or, otherwise, with
+    probability `rate`. Unprofiled requests only pay for that check.
+    For each profiled request two files are written to `directory`:
+    the profile itself and a JSON summary of wall vs CPU time per node.
+    """
+
+    def __init__(self, directory: str = "profiles", rate: float = 0.0, mode: str = "sample", interval_ms: float = 5.0):
+        if mode not in ("sample", "cprofile"):
+            raise ValueError(f"Unknown profiling mode: {mode}")
+
+        self.directory = directory
+        self.rate = rate
+        self.mode = mode
+        self.interval_s = interval_ms / 1000
+
+    def start(self, ctx, profile=False):
+        """
+        Returns a profiling session for the request, or None if it is not profiled.
+        A truthy `profile` forces profiling; a string is also used as the
+        profile's ID (otherwise a new one is generated).
+        """
+        if not profile and (self.rate <= 0 or random.random() >= self.rate):
+            return None
+
+        if self.mode == "cprofile":
+            session = CProfileSession(ctx.request_id)
+        else:
+            session = SamplingSession(ctx.request_id, self.interval_s)
+
+        # Files are named by this ID, never by the caller-supplied request ID
+        session.profile_id = profile if isinstance(profile, str) else uuid.uuid4().hex
+        return session
+
+    def finish(self, ctx):
+        """
+        Stops the request's session and writes its profile and node summary.
+        """
+        session = ctx.profile
+        if session is None:
+            return
+
+        session.stop()
+        os.makedirs(self.directory, exist_ok=True)
+        base = os.path.join(self.directory, session.profile_id)
+        session.dump(f"{base}.{session.extension}")
+
+        nodes = [
+            {**node, "wait_ms": round(max(node["wall_ms"] - node["cpu_ms"], 0.0), 3)}
+            for node in ctx.nodes
+        ]
+        wall_ms = (time.time() - ctx.started_at) * 1000
+        node_wall_ms = sum(n["wall_ms"] for n in nodes)
+        summary = {
+            "profile_id": session.profile_id,
+            "request_id": ctx.request_id,
+            "mode": self.mode,
+            "samples": session.samples,
+            "wall_ms": round(wall_ms, 2),
+            "node_wall_ms": round(node_wall_ms, 3),
+            "node_cpu_ms": round(sum(n["cpu_ms"] for n in nodes), 3),
+            # Graph scheduling, checkpointing and state merging between nodes
+            "outside_nodes_ms": round(max(wall_ms - node_wall_ms, 0.0), 3),
+            "nodes": nodes,
+            "llm_calls": ctx.llm_calls,
+            "search_calls": ctx.search_calls
+        }
+        with open(f"{base}.json", "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+
+        print(f"[INFO] Profile written to {base}.{session.extension}")
+
+
+def profiler_from_env() -> Profiler:
+    return Profiler(
+        directory=os.getenv("AGENT_PROFILE_DIR", "profiles"),
+        rate=float(os.getenv("AGENT_PROFILE_RATE", "0")),
+        mode=os.getenv("AGENT_PROFILE_MODE", "sample"),
+        interval_ms=float(os.getenv("AGENT_PROFILE_INTERVAL_MS", "5"))
+    )
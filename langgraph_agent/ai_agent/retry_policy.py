@@ -0,0 +1,216 @@
+import atexit
+import json
+import os
+import random
+import re
+import tempfile
+import threading
+from datetime import date
+
+
+# Recovery actions and their relative cost in backend calls
+#   reverify     -> verification only (1 LLM call)
+#   resynthesize -> synthesis + verification (2 LLM calls)
+#   research     -> search + synthesis + verification (1 search + 2 LLM calls)
+ACTION_COSTS = {
+    "reverify": 1.0,
+    "resynthesize": 2.0,
+    "research": 3.0
+}
+
+# Prior belief of how often each action turns a failure into a pass.
+# These only seed the estimates; recorded outcomes take over quickly.
+PRIORS = {
+    "SYNTHESIS_ERROR": {"resynthesize": 0.5, "reverify": 0.3, "research": 0.2},
+    "VERIFICATION_NOT_GROUNDED": {"research": 0.5, "resynthesize": 0.3, "reverify": 0.2},
+    "VERIFICATION_LOW_CONFIDENCE": {"reverify": 0.4, "research": 0.4, "resynthesize": 0.3},
+    "DECISION_PARSE_ERROR": {"research": 0.6, "reverify": 0.2, "resynthesize": 0.1},
+    "SEARCH_ERROR": {"research": 0.5, "reverify": 0.1, "resynthesize": 0.1},
+    "VERIFICATION_UNAVAILABLE": {"reverify": 0.6, "resynthesize": 0.1, "research": 0.1}
+}
+DEFAULT_PRIOR = {"research": 0.4, "resynthesize": 0.3, "reverify": 0.2}
+
+# How many observations the prior is worth
+PRIOR_WEIGHT = 4.0
+
+QUESTION_WORDS = {
+    "who", "what", "when", "where", "which", "why", "how", "is", "are", "was", "were",
+    "do", "does", "did", "can", "could", "the", "a", "an", "of", "in", "on", "to", "me", "tell"
+}
+
+
+def reformulate_query(user_input: str, attempt: int) -> str:
+    """
+    Builds a different search query for a retry, without an extra LLM call.
+    The first retry searches by keywords; later ones also pin the current year.
+    """
+    words = re.findall(r"[\w'.-]+", user_input)
+    keywords = [w for w in words if w.lower() not in QUESTION_WORDS]
+    query = " ".join(keywords) or user_input
+
+    if attempt > 1:
+        query = f"{query} {date.today().year}"
+    return query
+
+
+class RetryPolicy:
+    """
+    RetryPolicy: Picks the cheapest recovery action for a verification failure.
+
+    For every (failure_type, action) pair it keeps a Beta estimate of the chance
+    that the action flips the verdict to pass, seeded from PRIORS and updated
+    from recorded outcomes. An action is chosen by its expected cost per pass
+    (cost / success probability); if no action is likely enough to succeed the
+    policy says "stop".
+    """
+
+    def __init__(self, min_success: float = 0.15, explore: bool = True, stats_path: str = None,
+                 flush_interval_s: float = 10.0):
+        self.min_success = min_success
+        self.explore = explore
+        self.stats_path = stats_path
+        self.flush_interval_s = flush_interval_s
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        self._outcomes = {}
+        self._dirty = False
+        self._stop = threading.Event()
+        self._thread = None
+
+        if stats_path and os.path.exists(stats_path):
+            with open(stats_path, encoding="utf-8") as f:
+                self._outcomes = {tuple(k.split("/", 1)): v for k, v in json.load(f).items()}
+            print(f"[INFO] Retry policy loaded {len(self._outcomes)} outcome counters from {stats_path}")
+
+        # Outcomes are persisted in the background, never on the request path
+        if stats_path:
+            self._thread = threading.Thread(target=self._flush_loop, name="retry-stats", daemon=True)
+            self._thread.start()
+
+    def _posterior(self, failure_type: str, action: str):
+        prior = PRIORS.get(failure_type, DEFAULT_PRIOR).get(action, 0.1)
+        counts = self._outcomes.get((failure_type, action), {"attempts": 0, "flips": 0})
+        alpha = prior * PRIOR_WEIGHT + counts["flips"]
+        beta = (1 - prior) * PRIOR_WEIGHT + counts["attempts"] - counts["flips"]
+        return alpha, beta
+
+    def allowed_actions(self, state: dict) -> list:
+        actions = ["research", "reverify"]
+
+        # Re-synthesis needs search results to work from
+        if state.get("search_refs"):
+            actions.append("resynthesize")
+        return actions
+
+    def choose(self, state: dict) -> str:
+        """
+        Returns the recovery action for the current failure, or "stop".
+        """
+        failure_type = state.get("failure_type") or "VERIFICATION_NOT_GROUNDED"
+
+        best_action, best_cost, best_success = "stop", None, 0.0
+        with self._lock:
+            for action in self.allowed_actions(state):
+                alpha, beta = self._posterior(failure_type, action)
+
+                # Sampling (rather than using the mean) keeps trying actions that
+                # have little data, so the estimates keep improving
+                if self.explore:
+                    success = random.betavariate(alpha, beta)
+                else:
+                    success = alpha / (alpha + beta)
+
+                cost = ACTION_COSTS[action] / max(success, 1e-6)
+                if best_cost is None or cost < best_cost:
+                    best_action, best_cost, best_success = action, cost, success
+
+        if best_success < self.min_success:
+            return "stop"
+        return best_action
+
+    def record_outcome(self, failure_type: str, action: str, passed: bool):
+        """
+        Records whether `action`, taken for `failure_type`, led to a passing verdict.
+        """
+        with self._lock:
+            counts = self._outcomes.setdefault((failure_type, action), {"attempts": 0, "flips": 0})
+            counts["attempts"] += 1
+            if passed:
+                counts["flips"] += 1
+            self._dirty = True
+
+    def save(self):
+        """
+        Writes the outcome counters to `stats_path` if they changed since the last save.
+        """
+        with self._save_lock:
+            with self._lock:
+                if not self._dirty:
+                    return
+                data = {f"{ft}/{action}": dict(counts) for (ft, action), counts in self._outcomes.items()}
+                self._dirty = False
+
+            tmp_path = None
+            try:
+                # A temp file of its own per write, renamed into place atomically
+                directory = os.path.dirname(os.path.abspath(self.stats_path))
+                with tempfile.NamedTemporaryFile("w", encoding="utf-8", dir=directory, suffix=".tmp", delete=False) as f:
+                    tmp_path = f.name
+                    json.dump(data, f)
+                os.replace(tmp_path, self.stats_path)
+            except Exception as e:
+                print(f"[ERROR] Saving retry stats to {self.stats_path} failed: {e}")
+                with self._lock:
+                    self._dirty = True
+                if tmp_path and os.path.exists(tmp_path):
+                    os.unlink(tmp_path)
+
+    def _flush_loop(self):
+        while not self._stop.wait(self.flush_interval_s):
+            self.save()
+
+    def close(self):
+        """
+        Stops the background flush and saves any outstanding outcomes.
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        if self.stats_path:
+            self.save()
+
+    def stats(self) -> dict:
+        """
+        Returns, per failure type and action, the recorded outcomes, the
+        estimated success rate and the expected cost to reach a pass.
+        """
+        report = {}
+        with self._lock:
+            failure_types = set(PRIORS) | {ft for ft, _ in self._outcomes}
+            for failure_type in sorted(failure_types):
+                for action, cost in ACTION_COSTS.items():
+                    alpha, beta = self._posterior(failure_type, action)
+                    counts = self._outcomes.get((failure_type, action), {"attempts": 0, "flips": 0})
+                    success = alpha / (alpha + beta)
+                    report.setdefault(failure_type, {})[action] = {
+                        "attempts": counts["attempts"],
+                        "flips": counts["flips"],
+                        "observed_success_rate": round(counts["flips"] / counts["attempts"], 4) if counts["attempts"] else None,
+                        "estimated_success_rate": round(success, 4),
+                        "cost": cost,
+                        "expected_cost_per_pass": round(cost / success, 3)
+                    }
+        return report
+
+
+def retry_policy_from_env() -> RetryPolicy:
+    policy = RetryPolicy(
+        min_success=float(os.getenv("AGENT_RETRY_MIN_SUCCESS", "0.15")),
+        explore=os.getenv("AGENT_RETRY_EXPLORE", "1") == "1",
+        stats_path=os.getenv("AGENT_RETRY_STATS_PATH"),
+        flush_interval_s=float(os.getenv("AGENT_RETRY_STATS_FLUSH_S", "10"))
+    )
+
+    # Save outcomes recorded since the last flush when the process exits
+    atexit.register(policy.close)
+    return policy
@@ -0,0 +1,53 @@
+import threading
+
+from ddgs import DDGS
+
+
+class PooledSearchTool:
+    """
+    PooledSearchTool: Drop-in replacement for DuckDuckGoSearchRun that keeps one
+    long-lived DDGS client per worker thread, so the underlying HTTP connections
+    are reused across queries instead of being rebuilt on every call.
+    """
+
+    def __init__(self, max_results: int = 5, region: str = "wt-wt", safesearch: str = "moderate", timeout: int = 10):
+        self.max_results = max_results
+        self.region = region
+        self.safesearch = safesearch
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _client(self) -> DDGS:
+        client = getattr(self._local, "client", None)
+        if client is None:
+            client = DDGS(timeout=self.timeout)
+            self._local.client = client
+        return client
+
+    def results(self, query: str, max_results: int = None) -> list:
+        """
+        Returns the raw search hits as a list of {"title", "href", "body"} dicts.
+        """
+        hits = self._client().text(
+            query,
+            region=self.region,
+            safesearch=self.safesearch,
+            max_results=max_results or self.max_results
+        )
+        return [
+            {
+                "title": hit.get("title", ""),
+                "href": hit.get("href", ""),
+                "body": hit.get("body", "")
+            }
+            for hit in hits or []
+        ]
+
+    def run(self, query: str) -> str:
+        """
+        Returns the concatenated snippets, same format as DuckDuckGoSearchRun.
+        """
+        hits = self.results(query)
+        if not hits:
+            return "No good DuckDuckGo Search Result was found"
+        return " ".join(hit["body"] for hit in hits)
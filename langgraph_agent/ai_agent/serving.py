@@ -0,0 +1,226 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from ai_agent.agents import invoke_agent, stream_agent
+
+
+class PoolSaturated(Exception):
+    """
+    Raised when the request queue is full or a request waited too long for a slot.
+    """
+
+
+class PoolClosed(Exception):
+    """
+    Raised when a request arrives after shutdown has started.
+    """
+
+
+# Latency buckets (seconds) for the request histogram exposed on /metrics
+LATENCY_BUCKETS = (0.25, 0.5, 1, 2, 5, 10, 20, 30, 60, 120)
+
+
+class Metrics:
+    """
+    Metrics: Thread-safe counters and a latency histogram in Prometheus text format.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = {}
+        self.bucket_counts = [0] * len(LATENCY_BUCKETS)
+        self.latency_sum = 0.0
+        self.latency_count = 0
+
+    def inc(self, name: str, value: int = 1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def observe_latency(self, seconds: float):
+        with self._lock:
+            self.latency_sum += seconds
+            self.latency_count += 1
+            for i, bound in enumerate(LATENCY_BUCKETS):
+                if seconds <= bound:
+                    self.bucket_counts[i] += 1
+
+    def render(self, gauges: dict) -> str:
+        lines = []
+        with self._lock:
+            for name, value in sorted(self.counters.items()):
+                lines.append(f"# TYPE agent_{name}_total counter")
+                lines.append(f"agent_{name}_total {value}")
+
+            lines.append("# TYPE agent_request_latency_seconds histogram")
+            for bound, count in zip(LATENCY_BUCKETS, self.bucket_counts):
+                lines.append(f'agent_request_latency_seconds_bucket{{le="{bound}"}} {count}')
+            lines.append(f'agent_request_latency_seconds_bucket{{le="+Inf"}} {self.latency_count}')
+            lines.append(f"agent_request_latency_seconds_sum {round(self.latency_sum, 6)}")
+            lines.append(f"agent_request_latency_seconds_count {self.latency_count}")
+
+        for name, value in sorted(gauges.items()):
+            lines.append(f"# TYPE agent_{name} gauge")
+            lines.append(f"agent_{name} {value}")
+
+        return "\n".join(lines) + "\n"
+
+
+class AgentPool:
+    """
+    AgentPool: Runs graph invocations on a bounded thread pool.
+
+    At most `max_concurrency` requests execute at once; up to `max_queue` more
+    may wait for a slot (for at most `queue_timeout_s`). Anything beyond that is
+    rejected immediately so callers can back off instead of piling up.
+    """
+
+    def __init__(self, max_concurrency: int = 8, max_queue: int = 32, queue_timeout_s: float = 30.0):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout_s = queue_timeout_s
+
+        self.executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="agent")
+        self.metrics = Metrics()
+
+        self._slots = asyncio.Semaphore(max_concurrency)
+        self._queued = 0
+        self._in_flight = 0
+        self._closing = False
+        self._idle = asyncio.Event()
+        self._idle.set()
+
+    @property
+    def closing(self) -> bool:
+        return self._closing
+
+    def gauges(self) -> dict:
+        return {
+            "in_flight": self._in_flight,
+            "queued": self._queued,
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue
+        }
+
+    def admit(self, count: int = 1):
+        """
+        Reserves queue places for `count` requests, or rejects all of them.
+        Admitted requests are then run with invoke(..., admitted=True).
+        """
+        if self._closing:
+            self.metrics.inc("requests_rejected", count)
+            raise PoolClosed("Server is shutting down")
+
+        # Queued requests take free slots first; what is left over must fit in the queue
+        if self._in_flight + self._queued + count > self.max_concurrency + self.max_queue:
+            self.metrics.inc("requests_rejected", count)
+            raise PoolSaturated("Request queue is full" if count == 1 else f"Request queue cannot hold {count} requests")
+
+        self._queued += count
+
+    async def _acquire(self, admitted: bool = False):
+        if not admitted:
+            self.admit()
+
+        try:
+            await asyncio.wait_for(self._slots.acquire(), timeout=self.queue_timeout_s)
+        except asyncio.TimeoutError:
+            self.metrics.inc("requests_rejected")
+            raise PoolSaturated("Timed out waiting for a worker slot")
+        finally:
+            self._queued -= 1
+
+        self._in_flight += 1
+        self._idle.clear()
+
+    def _release(self):
+        self._in_flight -= 1
+        self._slots.release()
+        if self._in_flight == 0:
+            self._idle.set()
+
+    async def invoke(self, user_input: str, request_id: str = None, profile: bool | str = False, admitted: bool = False) -> dict:
+        """
+        Runs one query through the graph and returns its final state.
+        """
+
+        await self._acquire(admitted)
+        start_time = time.perf_counter()
+        try:
+            loop = asyncio.get_running_loop()
+            result = await loop.run_in_executor(self.executor, invoke_agent, user_input, request_id, profile)
+            self.metrics.inc("requests_completed")
+            return result
+
+        except Exception:
+            self.metrics.inc("requests_failed")
+            raise
+
+        finally:
+            self.metrics.observe_latency(time.perf_counter() - start_time)
+            self._release()
+
+    async def stream(self, user_input: str, request_id: str = None, profile: bool | str = False, admitted: bool = False):
+        """
+        Runs one query through the graph, yielding ("start", None, None) once it
+        holds a worker slot, ("node", name, update) after each node and
+        ("final", None, state) once the graph has finished.
+        """
+
+        await self._acquire(admitted)
+        try:
+            yield "start", None, None
+        except BaseException:
+            # Closed before the run started: give the slot back
+            self._release()
+            raise
+
+        start_time = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        events = asyncio.Queue()
+
+        def _worker():
+            state = None
+            try:
+                for node, delta, state in stream_agent(user_input, request_id, profile):
+                    loop.call_soon_threadsafe(events.put_nowait, ("node", node, delta))
+
+                loop.call_soon_threadsafe(events.put_nowait, ("final", None, state))
+
+            except Exception as e:
+                loop.call_soon_threadsafe(events.put_nowait, ("error", None, e))
+
+        future = loop.run_in_executor(self.executor, _worker)
+        try:
+            while True:
+                kind, node, payload = await events.get()
+                if kind == "error":
+                    self.metrics.inc("requests_failed")
+                    raise payload
+
+                yield kind, node, payload
+
+                if kind == "final":
+                    self.metrics.inc("requests_completed")
+                    break
+
+        finally:
+            # The worker keeps its slot until the graph really stops, even if the client went away
+            await asyncio.shield(future)
+            self.metrics.observe_latency(time.perf_counter() - start_time)
+            self._release()
+
+    async def close(self, timeout_s: float = 30.0):
+        """
+        Stops accepting work and waits for in-flight requests to finish.
+        """
+
+        self._closing = True
+        print(f"[INFO] Draining {self._in_flight} in-flight request(s)...")
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout=timeout_s)
+        except asyncio.TimeoutError:
+            print(f"[WARN] Shutdown timeout reached with {self._in_flight} request(s) still running")
+
+        self.executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,102 @@
+import json
+import os
+import random
+import re
+import time
+
+
+# Stubbed backends used for local load testing (AGENT_BACKEND=stub).
+# They mimic the latency and response shape of the real services without
+# making any network calls.
+stub_latency_ms = float(os.getenv("AGENT_STUB_LATENCY_MS", "300"))
+stub_jitter_ms = float(os.getenv("AGENT_STUB_JITTER_MS", "100"))
+stub_error_rate = float(os.getenv("AGENT_STUB_ERROR_RATE", "0"))
+stub_verify_fail_rate = float(os.getenv("AGENT_STUB_VERIFY_FAIL_RATE", "0"))
+stub_snippet_chars = int(os.getenv("AGENT_STUB_SNIPPET_CHARS", "200"))
+
+
+def _simulate_call():
+    delay_ms = max(0.0, stub_latency_ms + random.uniform(-stub_jitter_ms, stub_jitter_ms))
+    time.sleep(delay_ms / 1000)
+
+    if random.random() < stub_error_rate:
+        raise RuntimeError("Stub backend error (simulated)")
+
+
+class StubUsage:
+    def __init__(self, prompt: str, text: str):
+        self.prompt_token_count = len(prompt) // 4
+        self.candidates_token_count = len(text) // 4
+        self.total_token_count = self.prompt_token_count + self.candidates_token_count
+
+
+class StubResponse:
+    def __init__(self, prompt: str, text: str):
+        self.text = text
+        self.usage_metadata = StubUsage(prompt, text)
+
+
+class StubModel:
+    """
+    StubModel: Stands in for genai.GenerativeModel and answers each prompt type
+    (decision, synthesis, verification) with a well-formed canned response.
+    """
+
+    def __init__(self, model_name: str):
+        self.model_name = model_name
+
+    def generate_content(self, prompt: str) -> StubResponse:
+        _simulate_call()
+
+        if "reviewing several independent answers" in prompt:
+            verdicts = []
+            for item_id in re.findall(r"^### Item (\d+)", prompt, re.MULTILINE):
+                if random.random() < stub_verify_fail_rate:
+                    verdicts.append({"id": int(item_id), "verdict": "fail", "reason": random.choice(["grounding", "format"])})
+                else:
+                    verdicts.append({"id": int(item_id), "verdict": "pass"})
+            text = json.dumps(verdicts)
+        elif "You are a verification agent" in prompt:
+            if random.random() < stub_verify_fail_rate:
+                text = json.dumps({"verdict": "fail", "reason": random.choice(["grounding", "format"])})
+            else:
+                text = json.dumps({"verdict": "pass"})
+        elif "Allowed formats" in prompt:
+            text = json.dumps({"action": "SEARCH", "reason": "Stub backend always searches"})
+        else:
+            text = "This is a stubbed answer."
+
+        return StubResponse(prompt, text)
+
+
+class StubSearchTool:
+    """
+    StubSearchTool: Stands in for the search tool and returns fixed snippets.
+    """
+
+    def results(self, query: str, max_results: int = None) -> list:
+        _simulate_call()
+        return [
+            {
+                "title": f"Stub result {i + 1}",
+                "href": f"https://example.com/stub/{i + 1}",
+                "body": f"Stub snippet {i + 1} about {query}. ".ljust(stub_snippet_chars, "x")
+            }
+            for i in range(max_results or 5)
+        ]
+
+    def run(self, query: str) -> str:
+        return " ".join(hit["body"] for hit in self.results(query))
+
+
+class StubDeepReader:
+    """
+    StubDeepReader: Stands in for the deep reader and returns one passage per page.
+    """
+
+    def read(self, query: str, urls: list) -> list:
+        _simulate_call()
+        return [
+            {"url": url, "text": f"Stub passage from {url} about {query}. ".ljust(stub_snippet_chars * 2, "x")}
+            for url in urls[:3]
+        ]
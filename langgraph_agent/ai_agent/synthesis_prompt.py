@@ -12,6 +12,7 @@ If the answer depends on the current date, interpret it relative to today.
 Do NOT summarize.
 Do NOT hedge.
 Do NOT restate the question.
+If the question has several parts, answer every part, using the information found for it.
 
 Question:
 {user_input}
@@ -35,6 +36,7 @@ Rules:
 - Do NOT add explanations or commentary.
 - Do NOT restate the question.
 - Do NOT guess or assume facts not present.
+- If the question has several parts, answer every part.
 - If the information does not clearly answer the question, respond EXACTLY with:
 The information does not allow a definitive answer.
 
@@ -0,0 +1,328 @@
+import atexit
+import hashlib
+import os
+import queue
+import threading
+import time
+import uuid
+
+from ai_agent.context import get_request
+
+
+def traced_node(name: str, fn):
+    """
+    Wraps a graph node so its wall and CPU time are recorded on the request.
+    """
+
+    def node(state):
+        ctx = get_request()
+        if ctx is None:
+            return fn(state)
+
+        previous_node, previous_record = ctx.current_node, ctx.current_record
+        record = {"node": name, "wall_ms": 0.0, "cpu_ms": 0.0}
+        ctx.current_node, ctx.current_record = name, record
+        profile = ctx.profile
+        wall_start = time.perf_counter()
+        cpu_start = time.thread_time()
+        try:
+            if profile is None:
+                update = fn(state)
+            else:
+                with profile.node(name):
+                    update = fn(state)
+        finally:
+            with ctx.lock:
+                record["wall_ms"] = round((time.perf_counter() - wall_start) * 1000, 3)
+                record["cpu_ms"] = round(record["cpu_ms"] + (time.thread_time() - cpu_start) * 1000, 3)
+            ctx.nodes.append(record)
+            ctx.current_node, ctx.current_record = previous_node, previous_record
+
+        if update and update.get("retry_action"):
+            ctx.retry_actions.append(update["retry_action"])
+        return update
+
+    node.__name__ = getattr(fn, "__name__", name)
+    return node
+
+
+def traced_worker(fn):
+    """
+    Wraps work a node hands to a worker thread, so it is profiled under the
+    node and its CPU time is added to the node's record (also when it
+    finishes after the node). Must be called in the node's thread.
+    """
+    ctx = get_request()
+    if ctx is None or ctx.current_record is None:
+        return fn
+
+    name, record = ctx.current_node, ctx.current_record
+
+    def work(*args, **kwargs):
+        profile = ctx.profile
+        cpu_start = time.thread_time()
+        try:
+            if profile is None:
+                return fn(*args, **kwargs)
+            with profile.node(name):
+                return fn(*args, **kwargs)
+        finally:
+            with ctx.lock:
+                record["cpu_ms"] = round(record["cpu_ms"] + (time.thread_time() - cpu_start) * 1000, 3)
+
+    return work
+
+
+class TracedModel:
+    """
+    TracedModel: Records every generate_content call (node, model, tokens, outcome) on the request.
+    """
+
+    def __init__(self, name: str, model):
+        self.name = name
+        self.model = model
+
+    def generate_content(self, prompt: str):
+        ctx = get_request()
+        start = time.perf_counter()
+        call = {"node": ctx.current_node if ctx else None, "model": self.name, "ok": False, "prompt_tokens": 0, "output_tokens": 0}
+        try:
+            response = self.model.generate_content(prompt)
+            call["ok"] = True
+
+            usage = getattr(response, "usage_metadata", None)
+            if usage is not None:
+                call["prompt_tokens"] = getattr(usage, "prompt_token_count", 0) or 0
+                call["output_tokens"] = getattr(usage, "candidates_token_count", 0) or 0
+            return response
+
+        finally:
+            call["ms"] = round((time.perf_counter() - start) * 1000, 3)
+            if ctx is not None:
+                ctx.llm_calls.append(call)
+
+
+class TracedSearchTool:
+    """
+    TracedSearchTool: Counts search calls on the request.
+    """
+
+    def __init__(self, tool):
+        self.tool = tool
+
+    def run(self, query: str) -> str:
+        ctx = get_request()
+        if ctx is not None:
+            ctx.search_calls += 1
+        return self.tool.run(query)
+
+    def results(self, query: str, max_results: int = None) -> list:
+        ctx = get_request()
+        if ctx is not None:
+            ctx.search_calls += 1
+        return self.tool.results(query, max_results=max_results)
+
+
+def _model_for(ctx, node: str) -> str:
+    # The model that produced the node's result is its last successful call
+    model = None
+    for call in ctx.llm_calls:
+        if call["node"] == node and call["ok"]:
+            model = call["model"]
+    return model
+
+
+def build_trace_record(state: dict, ctx) -> dict:
+    """
+    Flattens one finished request into a trace row.
+    """
+
+    nodes = [n["node"] for n in ctx.nodes]
+    verification = state.get("verification") or {}
+
+    if "abort" in nodes:
+        outcome = "abort"
+    elif verification.get("verdict") == "pass":
+        outcome = "pass"
+    else:
+        outcome = "fail"
+
+    return {
+        "request_id": ctx.request_id,
+        "ts": ctx.started_at,
+        "input_hash": hashlib.sha256(ctx.user_input.encode("utf-8")).hexdigest()[:16],
+        "action": (state.get("decision") or {}).get("action"),
+        "route_reason": state.get("route_reason"),
+        "decision_model": state.get("decision_model"),
+        "synthesis_model": _model_for(ctx, "synthesize"),
+        "verification_model": state.get("verification_model"),
+        "retries": state.get("retries") or 0,
+        "retry_actions": list(ctx.retry_actions),
+        "failure_type": state.get("failure_type"),
+        "outcome": outcome,
+        "confidence": state.get("confidence"),
+        "latency_ms": state.get("latency_ms"),
+        "llm_calls": len(ctx.llm_calls),
+        "llm_failures": sum(1 for call in ctx.llm_calls if not call["ok"]),
+        "prompt_tokens": sum(call["prompt_tokens"] for call in ctx.llm_calls),
+        "output_tokens": sum(call["output_tokens"] for call in ctx.llm_calls),
+        "search_calls": ctx.search_calls,
+        "nodes": list(ctx.nodes),
+        "variant": None if ctx.variant is None else f"shadow:{ctx.variant.name}" if ctx.shadow else ctx.variant.name
+    }
+
+
+def trace_schema():
+    import pyarrow as pa
+
+    return pa.schema([
+        ("request_id", pa.string()),
+        ("ts", pa.float64()),
+        ("input_hash", pa.string()),
+        ("action", pa.string()),
+        ("route_reason", pa.string()),
+        ("decision_model", pa.string()),
+        ("synthesis_model", pa.string()),
+        ("verification_model", pa.string()),
+        ("retries", pa.int32()),
+        ("retry_actions", pa.list_(pa.string())),
+        ("failure_type", pa.string()),
+        ("outcome", pa.string()),
+        ("confidence", pa.float64()),
+        ("latency_ms", pa.float64()),
+        ("llm_calls", pa.int32()),
+        ("llm_failures", pa.int32()),
+        ("prompt_tokens", pa.int64()),
+        ("output_tokens", pa.int64()),
+        ("search_calls", pa.int32()),
+        ("nodes", pa.list_(pa.struct([
+            ("node", pa.string()),
+            ("wall_ms", pa.float64()),
+            ("cpu_ms", pa.float64())
+        ]))),
+        ("variant", pa.string())
+    ])
+
+
+class TraceWriter:
+    """
+    TraceWriter: Writes trace rows to rolling Parquet files from a background thread.
+
+    submit() never blocks the request path: rows go into a bounded queue and
+    are dropped (and counted) if the writer falls behind. Rows are written in
+    row groups of up to `batch_rows`; a file is closed and a new one started
+    after `roll_rows` rows or `roll_interval_s` seconds. Files being written
+    carry a .tmp suffix so readers only ever see complete files.
+    """
+
+    def __init__(self, directory: str, batch_rows: int = 1000, flush_interval_s: float = 5.0,
+                 roll_rows: int = 500000, roll_interval_s: float = 3600, queue_size: int = 10000):
+        import pyarrow  # noqa: F401  (fail fast if tracing is enabled without pyarrow)
+
+        self.directory = directory
+        self.batch_rows = batch_rows
+        self.flush_interval_s = flush_interval_s
+        self.roll_rows = roll_rows
+        self.roll_interval_s = roll_interval_s
+        self.dropped = 0
+        self.written = 0
+
+        os.makedirs(directory, exist_ok=True)
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._schema = trace_schema()
+        self._writer = None
+        self._path = None
+        self._file_rows = 0
+        self._file_opened_at = 0.0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._loop, name="trace-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, record: dict):
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def _open(self):
+        import pyarrow.parquet as pq
+
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        self._path = os.path.join(self.directory, f"traces-{stamp}-{os.getpid()}-{uuid.uuid4().hex[:6]}.parquet")
+        self._writer = pq.ParquetWriter(f"{self._path}.tmp", self._schema, compression="zstd")
+        self._file_rows = 0
+        self._file_opened_at = time.time()
+
+    def _close_file(self):
+        if self._writer is None:
+            return
+        self._writer.close()
+        os.replace(f"{self._path}.tmp", self._path)
+        self._writer = None
+
+    def _write(self, rows: list):
+        import pyarrow as pa
+
+        if self._writer is None:
+            self._open()
+
+        self._writer.write_table(pa.Table.from_pylist(rows, schema=self._schema))
+        self._file_rows += len(rows)
+        self.written += len(rows)
+
+        if self._file_rows >= self.roll_rows or time.time() - self._file_opened_at >= self.roll_interval_s:
+            self._close_file()
+
+    def _loop(self):
+        rows = []
+        last_flush = time.time()
+
+        while not (self._stop.is_set() and self._queue.empty()):
+            try:
+                rows.append(self._queue.get(timeout=0.5))
+            except queue.Empty:
+                pass
+
+            if rows and (len(rows) >= self.batch_rows or time.time() - last_flush >= self.flush_interval_s):
+                try:
+                    self._write(rows)
+                except Exception as e:
+                    print(f"[ERROR] Trace write failed, dropping {len(rows)} row(s): {e}")
+                    self.dropped += len(rows)
+                rows = []
+                last_flush = time.time()
+
+            # Roll idle files too, so they become readable
+            if self._writer is not None and time.time() - self._file_opened_at >= self.roll_interval_s:
+                self._close_file()
+
+        if rows:
+            self._write(rows)
+        self._close_file()
+
+    def close(self, timeout_s: float = 10.0):
+        """
+        Flushes queued rows and closes the current file.
+        """
+        self._stop.set()
+        self._thread.join(timeout=timeout_s)
+
+
+def trace_writer_from_env():
+    """
+    Starts the TraceWriter configured by AGENT_TRACE_DIR, if any.
+    """
+    directory = os.getenv("AGENT_TRACE_DIR")
+    if not directory:
+        return None
+
+    print(f"[INFO] Writing request traces to {directory}")
+    writer = TraceWriter(
+        directory,
+        roll_rows=int(os.getenv("AGENT_TRACE_ROLL_ROWS", "500000")),
+        roll_interval_s=float(os.getenv("AGENT_TRACE_ROLL_INTERVAL_S", "3600"))
+    )
+
+    # Flush whatever is still queued when the process exits
+    atexit.register(writer.close)
+    return writer
@@ -0,0 +1,278 @@
+import contextvars
+import json
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+
+class EnsembleResult:
+    def __init__(self, verdict: dict, model: str, votes: list, degraded: bool = False, reason: str = None):
+        self.verdict = verdict
+        self.model = model
+        self.votes = votes
+        self.degraded = degraded
+        self.reason = reason
+        # Verifier calls still running after the decision
+        self.pending = []
+
+
+def parse_verdict(text: str) -> dict:
+    """
+    Parses a verifier response into a verdict dict; raises if it is not one.
+    """
+    cleaned = text.strip().replace("```json", "").replace("```", "").replace("json", "").strip()
+    verdict = json.loads(cleaned)
+    if not isinstance(verdict, dict) or verdict.get("verdict") not in ("pass", "fail"):
+        raise ValueError(f"Not a verdict: {cleaned[:80]}")
+    return verdict
+
+
+class VerifierStats:
+    def __init__(self, window: int = 5000):
+        self.calls = 0
+        self.ok = 0
+        self.errors = 0
+        self.late = 0
+        self.cancelled = 0
+        self.decisive = 0
+        self.passes = 0
+        self.fails = 0
+        self.compared = 0
+        self.agreed = 0
+        self.latencies = deque(maxlen=window)
+
+    def report(self) -> dict:
+        latencies = sorted(self.latencies)
+
+        def percentile(pct):
+            if not latencies:
+                return None
+            return round(latencies[min(len(latencies) - 1, int(pct / 100 * len(latencies)))], 2)
+
+        return {
+            "calls": self.calls,
+            "ok": self.ok,
+            "errors": self.errors,
+            "finished_after_decision": self.late,
+            "cancelled_before_start": self.cancelled,
+            "decisive": self.decisive,
+            "pass": self.passes,
+            "fail": self.fails,
+            "agreement_with_ensemble": round(self.agreed / self.compared, 4) if self.compared else None,
+            "latency_ms": {"p50": percentile(50), "p90": percentile(90), "p99": percentile(99)}
+        }
+
+
+class EnsembleRun:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.results = {}
+        self.decision = None
+        self.closed = False
+
+
+class VerifierEngine:
+    """
+    VerifierEngine: Runs several verifiers on one answer concurrently and
+    returns as soon as `quorum` of them agree.
+
+    Only the first `quorum` verifiers start right away; the others start if no
+    decision has been reached within `hedge_ms` or one of them has failed, so
+    they cost extra calls only when the primary is slow or broken
+    (`hedge_ms=0` starts them all at once). Once a decision is reached,
+    verifiers that have not started are cancelled and the running ones are
+    no longer waited for (their results still count towards the statistics). If every verifier answers without reaching the quorum,
+    any "fail" wins.
+
+    If no verifier gives a verdict within `timeout_s` (or all of them error),
+    the result is degraded: `degraded="fail"` fails the answer so the retry
+    logic takes over, `degraded="pass"` lets it through, marked as unverified.
+    """
+
+    def __init__(self, quorum: int = 1, timeout_s: float = 20.0, hedge_ms: float = 3000.0,
+                 degraded: str = "fail", max_workers: int = 32):
+        if degraded not in ("fail", "pass"):
+            raise ValueError(f"Unknown degraded mode: {degraded}")
+
+        self.quorum = quorum
+        self.timeout_s = timeout_s
+        self.hedge_s = hedge_ms / 1000
+        self.degraded = degraded
+
+        self.runs = 0
+        self.early_exits = 0
+        self.no_quorum = 0
+        self.degraded_runs = 0
+        self._lock = threading.Lock()
+        self._stats = {}
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="verifier")
+
+    def _stats_for(self, name: str) -> VerifierStats:
+        return self._stats.setdefault(name, VerifierStats())
+
+    @staticmethod
+    def _timed(fn):
+        start = time.perf_counter()
+        try:
+            return fn(), None, (time.perf_counter() - start) * 1000
+        except Exception as e:
+            return None, e, (time.perf_counter() - start) * 1000
+
+    def _finished(self, run: EnsembleRun, name: str, future, results: queue.Queue):
+        if future.cancelled():
+            with self._lock:
+                self._stats_for(name).cancelled += 1
+            return
+
+        verdict, error, ms = future.result()
+        with run.lock, self._lock:
+            stats = self._stats_for(name)
+            stats.latencies.append(ms)
+            if error is not None:
+                stats.errors += 1
+            else:
+                stats.ok += 1
+                if verdict["verdict"] == "pass":
+                    stats.passes += 1
+                else:
+                    stats.fails += 1
+
+                run.results[name] = verdict
+                if run.decision is not None:
+                    stats.compared += 1
+                    stats.agreed += verdict["verdict"] == run.decision
+
+            if run.closed:
+                stats.late += 1
+
+        results.put((name, verdict, error))
+
+    def run(self, verifiers: list) -> EnsembleResult:
+        """
+        Verifies one answer. `verifiers` is a list of (name, fn) in priority
+        order; each fn returns a verdict dict or raises.
+        """
+        run = EnsembleRun()
+        results = queue.Queue()
+        futures = []
+        quorum = min(self.quorum, len(verifiers))
+        start = time.perf_counter()
+        deadline = start + self.timeout_s
+
+        def launch(batch):
+            for name, fn in batch:
+                with self._lock:
+                    self._stats_for(name).calls += 1
+                # Each verifier runs in a copy of the request context so its calls are traced
+                future = self._executor.submit(contextvars.copy_context().run, self._timed, fn)
+                future.add_done_callback(lambda f, name=name: self._finished(run, name, f, results))
+                futures.append(future)
+
+        launch(verifiers[:quorum])
+        hedged = verifiers[quorum:]
+        if self.hedge_s <= 0:
+            launch(hedged)
+            hedged = []
+
+        votes, decision, outstanding = [], None, len(futures)
+        while outstanding or hedged:
+            now = time.perf_counter()
+            if now >= deadline:
+                break
+
+            wait_s = deadline - now
+            if hedged:
+                wait_s = min(wait_s, max(start + self.hedge_s - now, 0))
+
+            try:
+                name, verdict, error = results.get(timeout=wait_s)
+            except queue.Empty:
+                if hedged and time.perf_counter() >= start + self.hedge_s:
+                    outstanding += len(hedged)
+                    launch(hedged)
+                    hedged = []
+                continue
+
+            outstanding -= 1
+            if error is not None:
+                print(f"[WARN] Verifier {name} failed: {error}")
+                # Don't wait out the hedge delay once a verifier has failed
+                if hedged:
+                    outstanding += len(hedged)
+                    launch(hedged)
+                    hedged = []
+                continue
+
+            votes.append((name, verdict))
+            agreeing = [n for n, v in votes if v["verdict"] == verdict["verdict"]]
+            if len(agreeing) >= quorum:
+                decision = (name, verdict)
+                break
+
+        for future in futures:
+            future.cancel()
+
+        result = self._resolve(votes, decision, early=outstanding > 0)
+        result.pending = [future for future in futures if not future.done()]
+
+        with run.lock, self._lock:
+            run.closed = True
+            # A degraded verdict is a placeholder, so it is not used for agreement
+            if not result.degraded:
+                run.decision = result.verdict["verdict"]
+                for name, verdict in run.results.items():
+                    stats = self._stats_for(name)
+                    stats.compared += 1
+                    stats.agreed += verdict["verdict"] == run.decision
+                if decision is not None:
+                    self._stats_for(decision[0]).decisive += 1
+
+        return result
+
+    def _resolve(self, votes: list, decision, early: bool) -> EnsembleResult:
+        with self._lock:
+            self.runs += 1
+            if decision is not None:
+                self.early_exits += early
+                name, verdict = decision
+                return EnsembleResult(verdict, name, votes)
+
+            if votes:
+                # Answered without agreement: be conservative
+                self.no_quorum += 1
+                fails = [(n, v) for n, v in votes if v["verdict"] == "fail"]
+                name, verdict = (fails or votes)[0]
+                return EnsembleResult(verdict, name, votes, reason="no_quorum")
+
+            self.degraded_runs += 1
+
+        reason = "no verifier returned a verdict in time"
+        print(f"[ERROR] Verification degraded ({self.degraded}): {reason}")
+        verdict = {"verdict": self.degraded, "reason": "unverified"}
+        return EnsembleResult(verdict, None, votes, degraded=True, reason=reason)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "quorum": self.quorum,
+                "timeout_s": self.timeout_s,
+                "hedge_ms": self.hedge_s * 1000,
+                "degraded_mode": self.degraded,
+                "runs": self.runs,
+                "early_exits": self.early_exits,
+                "no_quorum": self.no_quorum,
+                "degraded": self.degraded_runs,
+                "verifiers": {name: stats.report() for name, stats in sorted(self._stats.items())}
+            }
+
+
+def verifier_engine_from_env() -> VerifierEngine:
+    return VerifierEngine(
+        quorum=int(os.getenv("AGENT_VERIFY_QUORUM", "1")),
+        timeout_s=float(os.getenv("AGENT_VERIFY_TIMEOUT_S", "20")),
+        hedge_ms=float(os.getenv("AGENT_VERIFY_HEDGE_MS", "3000")),
+        degraded=os.getenv("AGENT_VERIFY_DEGRADED", "fail")
+    )
@@ -36,4 +36,45 @@ Search Results:
 
 Final Answer:
 {final_answer}
-"""
\ No newline at end of file
+"""
+verify_batch_prompt = """
+You are a verification agent reviewing several independent answers at once.
+
+For EACH item below, verify whether its FINAL ANSWER is safe to return.
+
+Today's date: {today}
+
+Check every item strictly and on its own:
+
+1. GROUNDING:
+- If search results are provided, the final answer MUST be fully supported by them.
+- The answer must NOT introduce new names, dates, numbers, or facts that are not present in the search results.
+
+2. ROUTING:
+- SEARCH is required ONLY if the answer makes a factual claim that depends on real-world, time-sensitive,
+  or externally verifiable information AND no search results were used.
+- If the answer is a stable definition, mathematical result, or general concept that does not depend on
+  current or external information, then SEARCH is NOT required.
+
+3. FORMAT:
+- The answer must not hedge, speculate, or restate the question.
+
+Return a JSON array with exactly one object per item:
+[{{"id":1,"verdict":"pass"}},{{"id":2,"verdict":"fail","reason":"grounding|hallucination|routing|format"}}]
+
+Respond ONLY with the JSON array. No explanations.
+
+{items}
+"""
+
+verify_batch_item = """### Item {id}
+
+User Question:
+{user_input}
+
+Search Results:
+{search_result}
+
+Final Answer:
+{final_answer}
+"""
@@ -1,52 +1,165 @@
 import streamlit as st
-from ai_agent.agents import run_agent
 
 import os
 import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
 sys.path.append(os.path.dirname(__file__))
 
+# Agent calls shared by all sessions of this server process
+max_workers = int(os.getenv("AGENT_UI_MAX_WORKERS", "4"))
+max_pending = int(os.getenv("AGENT_UI_MAX_PENDING", "16"))
+
+# Per-session history limits
+max_messages = int(os.getenv("AGENT_UI_MAX_MESSAGES", "200"))
+page_size = int(os.getenv("AGENT_UI_PAGE_SIZE", "20"))
+
+# Progress shown while the graph moves through its nodes
+NODE_STATUS = {
+    "decide": "Deciding how to answer...",
+    "decompose": "Breaking the question into parts...",
+    "search": "Searching the web...",
+    "deep_read": "Reading the top results...",
+    "synthesize": "Writing the answer...",
+    "answer": "Writing the answer...",
+    "verify": "Verifying the answer...",
+    "increment_retry": "Retrying with more context...",
+    "abort": "Stopping safely..."
+}
+
+
+class AgentJob:
+    """
+    AgentJob: One agent call running on the shared executor.
+    """
+
+    def __init__(self, user_input: str):
+        self.user_input = user_input
+        self.nodes = []
+        self.future = None
+
+    def status_text(self) -> str:
+        if not self.nodes:
+            return "Thinking...."
+        return NODE_STATUS.get(self.nodes[-1], "Thinking....")
+
+
+class AgentRunner:
+    """
+    AgentRunner: Bounded executor shared by every session.
+    """
+
+    def __init__(self, agents):
+        self.agents = agents
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="agent-ui")
+        self.slots = threading.BoundedSemaphore(max_pending)
+
+    def submit(self, user_input: str):
+        """
+        Starts the agent in the background; returns None if too many calls are pending.
+        """
+        if not self.slots.acquire(blocking=False):
+            return None
+
+        job = AgentJob(user_input)
+        job.future = self.executor.submit(self._run, job)
+        return job
+
+    def _run(self, job: AgentJob) -> str:
+        try:
+            state = {}
+            for node, _, state in self.agents.stream_agent(job.user_input):
+                job.nodes.append(node)
+
+            return state.get("final_answer") or "No answer provided"
+
+        finally:
+            self.slots.release()
+
+
+@st.cache_resource
+def get_runner() -> AgentRunner:
+    # Importing the agent module compiles the graph and creates the models and
+    # search tool; caching it here means that happens once per process.
+    from ai_agent import agents
+    return AgentRunner(agents)
+
+
+def add_message(role: str, content: str):
+    messages = st.session_state.messages
+    messages.append({"role": role, "content": content})
+
+    # Keep only a bounded window of history in memory
+    if len(messages) > max_messages:
+        del messages[:-max_messages]
+
+
+def show_earlier():
+    st.session_state.visible += page_size
+
+
+@st.fragment(run_every=0.5)
+def pending_response():
+    """
+    Polls the running agent call without blocking the rest of the page.
+    """
+    job = st.session_state.job
+
+    if not job.future.done():
+        with st.chat_message("assistant"):
+            st.status(job.status_text(), state="running")
+        return
+
+    try:
+        add_message("assistant", job.future.result())
+    except Exception as e:
+        add_message("assistant", f"Agent failed: {e}")
+
+    st.session_state.job = None
+    st.rerun()
+
+
 st.set_page_config(page_title="AI agent", layout="centered")
 st.title("Ask anything")
 
+runner = get_runner()
+
 # Initialize chat history
 if "messages" not in st.session_state:
     st.session_state.messages = []
+if "visible" not in st.session_state:
+    st.session_state.visible = page_size
+if "job" not in st.session_state:
+    st.session_state.job = None
+
+# chat input
+user_input = st.chat_input("Ask a question:", disabled=st.session_state.job is not None)
+
+if user_input and st.session_state.job is None:
+    add_message("user", user_input)
 
-# Display chat history
-for msg in st.session_state.messages:
+    job = runner.submit(user_input)
+    if job is None:
+        add_message("assistant", "The agent is busy right now. Please try again in a moment.")
+    else:
+        st.session_state.job = job
+
+    st.session_state.visible = page_size
+    st.rerun()
+
+# Display the most recent page of chat history
+messages = st.session_state.messages
+hidden = len(messages) - st.session_state.visible
+if hidden > 0:
+    st.button(f"Show earlier messages ({hidden} hidden)", on_click=show_earlier)
+
+for msg in messages[-st.session_state.visible:]:
     with st.chat_message(msg["role"]):
-        st.write(msg["content"])
+        if msg["content"].startswith("Agent failed:"):
+            st.error(msg["content"])
+        else:
+            st.write(msg["content"])
 
-# chat input
-user_input = st.chat_input("Ask a question:")
-
-if user_input:
-    st.session_state.messages.append(
-        {
-            "role" : "user", "content" : user_input
-        }
-    )
-    with st.chat_message("user"):
-        st.write(user_input)
-
-    # agent response 
-    with st.chat_message("assistant"):
-        with st.spinner("Thinking...."):
-            try:
-                answer = run_agent(user_input)
-                st.write(answer)
-
-                st.session_state.messages.append(
-                    {
-                        "role" : "assistant", "content" : answer
-                    }
-                )
-            except Exception as e:
-                error_msg = f"Agent failed: {e}"
-                st.error(error_msg)
-
-                st.session_state.messages.append(
-                    {
-                        "role" : "assistant", "content" : error_msg
-                    }
-                )
+# agent response
+if st.session_state.job is not None:
+    pending_response()
@@ -0,0 +1,72 @@
+import argparse
+import contextlib
+import io
+import os
+import pickle
+import random
+import resource
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append(os.path.dirname(__file__))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure memory and log volume per request against stub backends.")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--snippet-chars", type=int, default=2000, help="Size of each stubbed search snippet")
+    parser.add_argument("--verify-fail-rate", type=float, default=0.3, help="Share of failed verifications, to exercise retries")
+    args = parser.parse_args()
+
+    # Stub backends with no latency so the numbers reflect the agent itself
+    os.environ["AGENT_BACKEND"] = "stub"
+    os.environ["AGENT_STUB_LATENCY_MS"] = "0"
+    os.environ["AGENT_STUB_JITTER_MS"] = "0"
+    os.environ["AGENT_STUB_SNIPPET_CHARS"] = str(args.snippet_chars)
+    os.environ["AGENT_STUB_VERIFY_FAIL_RATE"] = str(args.verify_fail_rate)
+
+    from ai_agent.agents import invoke_agent
+
+    # Same verdict sequence on every run so before/after numbers are comparable
+    random.seed(0)
+    questions = [f"Who is the CEO of company {i}?" for i in range(args.requests)]
+
+    # Sequential pass: traced peak allocation, final state size and log volume per request
+    peaks, state_sizes, log_bytes = [], [], []
+    tracemalloc.start()
+    for question in questions:
+        captured = io.StringIO()
+        tracemalloc.reset_peak()
+        base, _ = tracemalloc.get_traced_memory()
+        with contextlib.redirect_stdout(captured):
+            result = invoke_agent(question)
+        _, peak = tracemalloc.get_traced_memory()
+
+        peaks.append(peak - base)
+        state_sizes.append(len(pickle.dumps(dict(result))))
+        log_bytes.append(len(captured.getvalue()))
+    tracemalloc.stop()
+
+    # Concurrent pass: process peak RSS and throughput
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            list(pool.map(invoke_agent, questions))
+    elapsed = time.perf_counter() - start
+
+    def avg(values):
+        return sum(values) / len(values)
+
+    print(f"Requests:                 {args.requests} (snippet {args.snippet_chars} chars, concurrency {args.concurrency})")
+    print(f"Peak traced alloc / req:  avg {avg(peaks) / 1024:.1f} KiB, max {max(peaks) / 1024:.1f} KiB")
+    print(f"Final state size / req:   avg {avg(state_sizes) / 1024:.1f} KiB")
+    print(f"Log output / req:         avg {avg(log_bytes) / 1024:.1f} KiB")
+    print(f"Peak RSS (process):       {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.1f} MiB")
+    print(f"Concurrent throughput:    {args.requests / elapsed:.1f} req/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+
+
+def percentile(values: list, pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def run_load(url: str, total: int, concurrency: int, question: str):
+    latencies = []
+    statuses = {}
+    pending = asyncio.Semaphore(concurrency)
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=300) as client:
+
+        async def one(i: int):
+            async with pending:
+                start = time.perf_counter()
+                try:
+                    response = await client.post("/v1/ask", json={"question": f"{question} #{i}"})
+                    status = response.status_code
+                except httpx.HTTPError as e:
+                    status = type(e).__name__
+                latencies.append(time.perf_counter() - start)
+                statuses[status] = statuses.get(status, 0) + 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(total)))
+        elapsed = time.perf_counter() - start
+
+    print(f"Requests:    {total} (concurrency {concurrency})")
+    print(f"Elapsed:     {elapsed:.2f}s")
+    print(f"Throughput:  {total / elapsed:.2f} req/s")
+    print(f"Statuses:    {statuses}")
+    print(f"Latency p50: {percentile(latencies, 50) * 1000:.0f} ms")
+    print(f"Latency p95: {percentile(latencies, 95) * 1000:.0f} ms")
+    print(f"Latency p99: {percentile(latencies, 99) * 1000:.0f} ms")
+    print(f"Latency avg: {statistics.mean(latencies) * 1000:.0f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fire concurrent /v1/ask requests at a running server.")
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--question", default="Who is the current CEO of OpenAI?")
+    args = parser.parse_args()
+
+    asyncio.run(run_load(args.url, args.requests, args.concurrency, args.question))
+
+
+if __name__ == "__main__":
+    main()
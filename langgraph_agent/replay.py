@@ -0,0 +1,123 @@
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(__file__))
+
+
+def percentile(values: list, pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def summarize(values: list) -> dict:
+    return {
+        "count": len(values),
+        "mean": round(sum(values) / len(values), 2) if values else 0.0,
+        "p50": round(percentile(values, 50), 2),
+        "p95": round(percentile(values, 95), 2)
+    }
+
+
+def load_requests(path: str, limit: int = None) -> list:
+    """
+    Returns the (request_id, user_input) pairs recorded in a cassette.
+    """
+    requests = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            entry = json.loads(line)
+            if entry.get("kind") == "request":
+                requests.append((entry["req"], entry["input"]))
+                if limit and len(requests) >= limit:
+                    break
+    return requests
+
+
+def replay(path: str, time_scale: float, limit: int = None) -> dict:
+    # The cassette is configured from the environment when the agent module is imported
+    os.environ["AGENT_CASSETTE_MODE"] = "replay"
+    os.environ["AGENT_CASSETTE_PATH"] = path
+    os.environ["AGENT_CASSETTE_TIME_SCALE"] = str(time_scale)
+
+    from ai_agent import agents
+
+    node_ms = {}
+    request_ms = []
+    llm_calls = []
+    search_calls = []
+
+    for request_id, user_input in load_requests(path, limit):
+        start = time.perf_counter()
+        last = start
+        for node, _, _ in agents.stream_agent(user_input, request_id=request_id):
+            now = time.perf_counter()
+            node_ms.setdefault(node, []).append((now - last) * 1000)
+            last = now
+
+        request_ms.append((time.perf_counter() - start) * 1000)
+        counts = agents.cassette.request_calls.pop(request_id, {"llm": 0, "search": 0})
+        llm_calls.append(counts["llm"])
+        search_calls.append(counts["search"])
+
+    return {
+        "requests": len(request_ms),
+        "latency_ms": summarize(request_ms),
+        "node_latency_ms": {node: summarize(values) for node, values in sorted(node_ms.items())},
+        "llm_calls_per_request": summarize(llm_calls),
+        "search_calls_per_request": summarize(search_calls),
+        "cassette_hits": agents.cassette.hits,
+        "cassette_misses": agents.cassette.misses
+    }
+
+
+def compare(before: dict, after: dict):
+    def row(label, old, new):
+        delta = new - old
+        pct = f"{delta / old * 100:+.1f}%" if old else "n/a"
+        print(f"{label:<40} {old:>10.2f} {new:>10.2f} {pct:>9}")
+
+    print(f"{'metric':<40} {'before':>10} {'after':>10} {'change':>9}")
+    row("latency_ms.p50", before["latency_ms"]["p50"], after["latency_ms"]["p50"])
+    row("latency_ms.p95", before["latency_ms"]["p95"], after["latency_ms"]["p95"])
+    row("llm_calls_per_request.mean", before["llm_calls_per_request"]["mean"], after["llm_calls_per_request"]["mean"])
+    row("search_calls_per_request.mean", before["search_calls_per_request"]["mean"], after["search_calls_per_request"]["mean"])
+
+    for node in sorted(set(before["node_latency_ms"]) | set(after["node_latency_ms"])):
+        old = before["node_latency_ms"].get(node, {"mean": 0.0})
+        new = after["node_latency_ms"].get(node, {"mean": 0.0})
+        row(f"node.{node}.mean_ms", old["mean"], new["mean"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay recorded traffic through the graph offline.")
+    parser.add_argument("cassette", help="Cassette recorded with AGENT_CASSETTE_MODE=record")
+    parser.add_argument("--time-scale", type=float, default=1.0, help="Multiplier for recorded call durations (0 = no waiting)")
+    parser.add_argument("--limit", type=int, default=None, help="Replay at most this many requests")
+    parser.add_argument("--out", default=None, help="Write the report as JSON to this file")
+    parser.add_argument("--baseline", default=None, help="Report from an earlier run to compare against")
+    args = parser.parse_args()
+
+    report = replay(args.cassette, args.time_scale, args.limit)
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            compare(json.load(f), report)
+    else:
+        print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,230 @@
+import argparse
+import asyncio
+import json
+import os
+import sys
+import uuid
+from contextlib import asynccontextmanager
+
+sys.path.append(os.path.dirname(__file__))
+
+import uvicorn
+from fastapi import FastAPI, HTTPException, Request, Response
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from pydantic import BaseModel
+
+from ai_agent.agents import check_request_id, experiment, retry_policy, trace_writer, verifier_engine, verify_batcher
+from ai_agent.checkpointing import IdempotencyConflict, RequestInProgress
+from ai_agent.serving import AgentPool, PoolClosed, PoolSaturated
+
+max_concurrency = int(os.getenv("AGENT_MAX_CONCURRENCY", "8"))
+max_queue = int(os.getenv("AGENT_MAX_QUEUE", "32"))
+queue_timeout_s = float(os.getenv("AGENT_QUEUE_TIMEOUT_S", "30"))
+shutdown_timeout_s = float(os.getenv("AGENT_SHUTDOWN_TIMEOUT_S", "60"))
+max_batch_size = int(os.getenv("AGENT_MAX_BATCH_SIZE", "16"))
+
+# Fields of the final state returned to callers
+RESPONSE_FIELDS = (
+    "final_answer",
+    "decision_model",
+    "route_reason",
+    "retries",
+    "failure_type",
+    "confidence",
+    "latency_ms",
+    "variant"
+)
+
+
+class AskRequest(BaseModel):
+    question: str
+
+
+class BatchRequest(BaseModel):
+    questions: list[str]
+
+
+def to_response(state: dict) -> dict:
+    response = {field: state.get(field) for field in RESPONSE_FIELDS}
+    response["action"] = (state.get("decision") or {}).get("action")
+    return response
+
+
+def sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    app.state.pool = AgentPool(max_concurrency=max_concurrency, max_queue=max_queue, queue_timeout_s=queue_timeout_s)
+    print(f"[INFO] Agent pool ready (concurrency={max_concurrency}, queue={max_queue})")
+    yield
+    await app.state.pool.close(timeout_s=shutdown_timeout_s)
+    retry_policy.close()
+    if trace_writer is not None:
+        trace_writer.close()
+
+
+app = FastAPI(title="AI agent", lifespan=lifespan)
+
+
+@app.exception_handler(PoolSaturated)
+async def saturated_handler(request: Request, exc: PoolSaturated):
+    return JSONResponse({"error": str(exc)}, status_code=429, headers={"Retry-After": "1"})
+
+
+@app.exception_handler(PoolClosed)
+async def closed_handler(request: Request, exc: PoolClosed):
+    return JSONResponse({"error": str(exc)}, status_code=503)
+
+
+@app.exception_handler(IdempotencyConflict)
+async def conflict_handler(request: Request, exc: IdempotencyConflict):
+    # A retry that overlaps the original run can try again shortly
+    headers = {"Retry-After": "1"} if isinstance(exc, RequestInProgress) else None
+    return JSONResponse({"error": str(exc)}, status_code=409, headers=headers)
+
+
+def idempotency_key(request: Request):
+    # With checkpointing enabled, a retried request carrying the same key
+    # resumes from its last completed node instead of starting over
+    return request.headers.get("Idempotency-Key")
+
+
+def profile_request(request: Request, response_headers) -> tuple:
+    """
+    Returns (request_id, profile) for a request. "X-Agent-Profile: 1" profiles
+    it; the profile files are named after the ID sent back in "X-Agent-Profile-Id".
+    """
+    request_id = idempotency_key(request)
+    if request.headers.get("X-Agent-Profile") != "1":
+        return request_id, False
+
+    # Generated here: client headers never end up in file names
+    profile_id = uuid.uuid4().hex
+    response_headers["X-Agent-Profile-Id"] = profile_id
+    return request_id, profile_id
+
+
+@app.post("/v1/ask")
+async def ask(body: AskRequest, request: Request, response: Response):
+    pool = request.app.state.pool
+    request_id, profile = profile_request(request, response.headers)
+    try:
+        state = await pool.invoke(body.question, request_id, profile)
+    except (PoolSaturated, PoolClosed, IdempotencyConflict):
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Agent execution failed: {e}")
+
+    return to_response(state)
+
+
+@app.post("/v1/ask/stream")
+async def ask_stream(body: AskRequest, request: Request):
+    pool = request.app.state.pool
+
+    headers = {}
+    request_id, profile = profile_request(request, headers)
+
+    # A reused idempotency key gets 409 here, as on /v1/ask, not an error event
+    await asyncio.to_thread(check_request_id, body.question, idempotency_key(request))
+
+    # Admission and the wait for a worker slot happen before the stream starts,
+    # so a saturated pool answers 429 like /v1/ask instead of an SSE error event
+    pool.admit()
+    stream = pool.stream(body.question, request_id, profile, admitted=True)
+    await anext(stream)
+
+    async def events():
+        try:
+            async for kind, node, payload in stream:
+                if kind == "node":
+                    yield sse("node", {"node": node, "keys": sorted((payload or {}).keys())})
+                else:
+                    yield sse("answer", to_response(payload))
+        except Exception as e:
+            yield sse("error", {"error": str(e)})
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers=headers)
+
+
+@app.post("/v1/batch")
+async def batch(body: BatchRequest, request: Request):
+    pool = request.app.state.pool
+
+    if len(body.questions) > max_batch_size:
+        raise HTTPException(status_code=413, detail=f"Batch size exceeds {max_batch_size}")
+
+    # The batch is admitted as a whole (429 otherwise), so its items are never rejected one by one
+    pool.admit(len(body.questions))
+
+    async def run_one(question: str) -> dict:
+        try:
+            return to_response(await pool.invoke(question, admitted=True))
+        except Exception as e:
+            return {"error": str(e)}
+
+    results = await asyncio.gather(*(run_one(q) for q in body.questions))
+    return {"results": results}
+
+
+@app.get("/healthz")
+async def healthz(request: Request):
+    pool = request.app.state.pool
+    if pool.closing:
+        return JSONResponse({"status": "draining"}, status_code=503)
+    return {"status": "ok", **pool.gauges()}
+
+
+@app.get("/v1/retry-policy")
+async def retry_policy_stats():
+    return retry_policy.stats()
+
+
+@app.get("/v1/verifiers")
+async def verifier_stats():
+    return verifier_engine.stats()
+
+
+@app.get("/v1/experiment")
+async def experiment_stats():
+    if experiment is None:
+        raise HTTPException(status_code=404, detail="No experiment configured")
+    return experiment.report()
+
+
+@app.get("/metrics")
+async def metrics(request: Request):
+    pool = request.app.state.pool
+    gauges = pool.gauges()
+    if trace_writer is not None:
+        gauges["traces_written"] = trace_writer.written
+        gauges["traces_dropped"] = trace_writer.dropped
+    if verify_batcher is not None:
+        gauges.update(verify_batcher.stats())
+    gauges["verify_degraded"] = verifier_engine.degraded_runs
+    gauges["verify_early_exits"] = verifier_engine.early_exits
+    return PlainTextResponse(pool.metrics.render(gauges))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the LangGraph agent over HTTP.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=1, help="Number of worker processes")
+    args = parser.parse_args()
+
+    # Each worker process gets its own models, search clients and pool
+    uvicorn.run(
+        "server:app",
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        app_dir=os.path.dirname(os.path.abspath(__file__)),
+        timeout_graceful_shutdown=int(shutdown_timeout_s)
+    )
+
+
+if __name__ == "__main__":
+    main()
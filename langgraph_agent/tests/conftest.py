@@ -0,0 +1,105 @@
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+ARTICLE = """<html><head><title>Acme</title><style>p{color:red}</style><script>var x = "Acme CEO";</script></head>
+<body><nav><a href="/">Acme CEO news menu link that is long enough to count as a block of text</a></nav>
+<article><h1>Acme Corporation</h1>
+<p>Acme Corporation is a fictional company. Its chief executive officer (CEO) is Jane Roadrunner, who was appointed in 2021 after a long career in logistics.</p>
+<p>The company was founded in 1920 in Tucson, Arizona, and is best known for its anvils and rocket skates.</p>
+<p>Unrelated paragraph about the weather in the desert, which is mostly hot and sunny throughout the year.</p>
+</article><footer>Copyright Acme CEO footer text that should definitely be dropped by the parser</footer></body></html>"""
+
+SLOW_ARTICLE = ARTICLE.replace("Jane Roadrunner", "Wile Coyote")
+
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    """
+    Serves the pages the deep-read tests fetch; every request is counted per path.
+    """
+
+    hits = Counter()
+
+    def log_message(self, *args):
+        pass
+
+    def _html(self, body: str, headers: dict = None):
+        data = body.encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        path = urlparse(self.path).path
+
+        if path == "/article":
+            if self.headers.get("If-None-Match") == '"v1"':
+                self.hits[f"{self.path} 304"] += 1
+                self.send_response(304)
+                self.end_headers()
+                return
+            self.hits[self.path] += 1
+            self._html(ARTICLE, {"ETag": '"v1"'})
+
+        elif path == "/slow":
+            self.hits[self.path] += 1
+            time.sleep(2)
+            self._html(SLOW_ARTICLE)
+
+        elif path == "/delayed":
+            self.hits[self.path] += 1
+            time.sleep(0.3)
+            self._html(ARTICLE)
+
+        elif path == "/huge":
+            self.hits[self.path] += 1
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html")
+            self.end_headers()
+            try:
+                self.wfile.write(b"<p>" + b"Acme CEO filler sentence. " * 200000 + b"</p>")
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+
+        elif path == "/pdf":
+            self.hits[self.path] += 1
+            self.send_response(200)
+            self.send_header("Content-Type", "application/pdf")
+            self.end_headers()
+            self.wfile.write(b"%PDF-1.4 Acme CEO Jane Roadrunner")
+
+        else:
+            self.hits[self.path] += 1
+            self.send_response(404)
+            self.end_headers()
+
+
+@pytest.fixture(scope="session")
+def fixture_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FixtureHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def hits():
+    FixtureHandler.hits.clear()
+    return FixtureHandler.hits
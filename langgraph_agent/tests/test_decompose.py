@@ -0,0 +1,40 @@
+import pytest
+
+from ai_agent.decompose import plan_sub_queries, split_question
+
+
+@pytest.mark.parametrize("question, parts", [
+    ("Who is the CEO of Acme and when was Tucson founded?", ["Who is the CEO of Acme", "when was Tucson founded"]),
+    ("Who is the CEO of Acme? Where is Tucson?", ["Who is the CEO of Acme", "Where is Tucson"]),
+    ("Who is the CEO of Acme, when was Tucson founded?", ["Who is the CEO of Acme", "when was Tucson founded"]),
+    ("Who is the CEO of Acme; what does it cost?", ["Who is the CEO of Acme; what does it cost?"]),
+])
+def test_split_compound_questions(question, parts):
+    assert split_question(question) == parts
+
+
+@pytest.mark.parametrize("question", [
+    "In 2020, who won the US election?",
+    "Tell me, what is the capital of France?",
+    "Between Apple and Google, which is older?",
+    "Who founded Acme, which makes anvils?",
+    "Who won the 2018 World Cup and where was it held?",
+])
+def test_single_questions_stay_whole(question):
+    assert len(split_question(question)) == 1
+
+
+def test_model_sub_queries_are_used():
+    decision = {"action": "SEARCH", "sub_queries": ["Acme CEO", " acme ceo ", "Tucson founded", "", 3]}
+
+    assert plan_sub_queries(decision, "ignored", 4) == ["Acme CEO", "Tucson founded"]
+    assert plan_sub_queries(decision, "ignored", 1) == ["Acme CEO"]
+
+
+def test_omitted_sub_queries_keep_the_question_whole():
+    question = "Who is the CEO of Acme and when was Tucson founded?"
+
+    assert plan_sub_queries({"action": "SEARCH"}, question, 4) == []
+    assert plan_sub_queries({"action": "SEARCH"}, question, 4, heuristic=True) == [
+        "Who is the CEO of Acme", "when was Tucson founded"
+    ]
@@ -0,0 +1,164 @@
+import threading
+import time
+
+import pytest
+
+from ai_agent.deep_read import DeepReader, PageCache, relevant_passages
+
+
+QUERY = "Who is the CEO of Acme Corporation?"
+
+
+@pytest.fixture
+def make_reader():
+    readers = []
+
+    def make(**kwargs):
+        reader = DeepReader(**kwargs)
+        readers.append(reader)
+        return reader
+
+    yield make
+
+    for reader in readers:
+        reader.close()
+
+
+def test_reads_relevant_passages(fixture_server, make_reader):
+    reader = make_reader()
+    passages = reader.read(QUERY, [f"{fixture_server}/article"])
+
+    assert passages[0]["url"] == f"{fixture_server}/article"
+    assert "Jane Roadrunner" in passages[0]["text"]
+    # Navigation, footer and script text are not content
+    assert not any("footer" in p["text"] or "menu" in p["text"] for p in passages)
+
+
+def test_page_timeout_skips_slow_page(fixture_server, make_reader):
+    reader = make_reader(page_timeout_s=0.3, deadline_s=5)
+
+    start = time.perf_counter()
+    passages = reader.read(QUERY, [f"{fixture_server}/slow?t=page", f"{fixture_server}/article"])
+    elapsed = time.perf_counter() - start
+
+    assert elapsed < 1.5
+    assert {p["url"] for p in passages} == {f"{fixture_server}/article"}
+
+
+def test_deadline_returns_completed_pages(fixture_server, make_reader):
+    reader = make_reader(page_timeout_s=5, deadline_s=0.5)
+
+    start = time.perf_counter()
+    passages = reader.read(QUERY, [f"{fixture_server}/slow?t=deadline", f"{fixture_server}/article"])
+    elapsed = time.perf_counter() - start
+
+    assert elapsed < 1.5
+    assert {p["url"] for p in passages} == {f"{fixture_server}/article"}
+
+
+def test_max_bytes_caps_download(fixture_server, make_reader):
+    reader = make_reader(max_bytes=2048)
+    url = f"{fixture_server}/huge"
+
+    passages = reader.read(QUERY, [url])
+
+    assert passages
+    blocks = reader.cache.get(url)["blocks"]
+    assert 0 < sum(len(block) for block in blocks) <= 2048
+
+
+def test_non_html_page_is_skipped(fixture_server, make_reader, hits):
+    reader = make_reader()
+
+    assert reader.read(QUERY, [f"{fixture_server}/pdf"]) == []
+    assert hits["/pdf"] == 1
+
+
+def test_missing_page_is_skipped(fixture_server, make_reader):
+    reader = make_reader()
+    passages = reader.read(QUERY, [f"{fixture_server}/missing", f"{fixture_server}/article"])
+
+    assert {p["url"] for p in passages} == {f"{fixture_server}/article"}
+
+
+def test_stale_page_is_revalidated_with_etag(fixture_server, make_reader, hits):
+    reader = make_reader(cache=PageCache(max_age_s=0))
+    url = f"{fixture_server}/article?t=etag"
+
+    first = reader.read(QUERY, [url])
+    second = reader.read(QUERY, [url])
+
+    assert first == second
+    assert hits["/article?t=etag"] == 1
+    assert hits["/article?t=etag 304"] == 1
+    assert reader.cache.revalidated == 1
+
+
+def test_fresh_page_is_served_from_cache(fixture_server, make_reader, hits):
+    reader = make_reader()
+    url = f"{fixture_server}/article?t=cache"
+
+    reader.read(QUERY, [url])
+    reader.read(QUERY, [url])
+
+    assert hits["/article?t=cache"] == 1
+    assert reader.cache.hits == 1
+
+
+def test_concurrent_reads_share_one_download(fixture_server, make_reader, hits):
+    reader = make_reader()
+    url = f"{fixture_server}/delayed"
+    barrier = threading.Barrier(8)
+    results = []
+
+    def read():
+        barrier.wait()
+        results.append(reader.read(QUERY, [url]))
+
+    threads = [threading.Thread(target=read) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert hits["/delayed"] == 1
+    assert len(results) == 8
+    assert all(result == results[0] and result for result in results)
+
+
+def test_relevant_passages_ranking():
+    pages = [
+        ("https://a.example", [
+            "Acme was founded in Tucson.",
+            "The CEO of Acme Corporation is Jane Roadrunner.",
+            "Nothing to see here at all."
+        ]),
+        ("https://b.example", [
+            "The CEO of Acme Corporation is Jane Roadrunner.",
+            "Acme Corporation makes anvils.",
+            "Acme sells rocket skates."
+        ])
+    ]
+
+    ranked = relevant_passages(QUERY, pages, max_passages=10)
+
+    # Most matching terms first, ties broken by page rank and then position
+    assert ranked == [
+        ("https://a.example", "The CEO of Acme Corporation is Jane Roadrunner."),
+        ("https://b.example", "Acme Corporation makes anvils."),
+        ("https://a.example", "Acme was founded in Tucson."),
+        ("https://b.example", "Acme sells rocket skates.")
+    ]
+    assert len(relevant_passages(QUERY, pages, max_passages=2)) == 2
+
+
+def test_relevant_passages_needs_two_terms_for_long_queries():
+    pages = [("https://a.example", [
+        "Jane Roadrunner was appointed chief executive in 2021.",
+        "Tucson is hot in summer."
+    ])]
+
+    assert relevant_passages("When was Jane appointed to lead the company in Tucson?", pages, 5) == [
+        ("https://a.example", "Jane Roadrunner was appointed chief executive in 2021.")
+    ]
+    assert relevant_passages("", pages, 5) == []
@@ -0,0 +1,182 @@
+import argparse
+import math
+import os
+import sys
+import time
+from collections import defaultdict
+
+sys.path.append(os.path.dirname(__file__))
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+
+from ai_agent.tracing import trace_schema
+
+# Latencies are counted in log-spaced buckets (~2% wide), so percentiles over
+# any number of rows need only a few hundred counters per group
+BUCKET_BASE = 1.02
+LOG_BASE = math.log(BUCKET_BASE)
+
+
+class Histogram:
+    def __init__(self):
+        self.counts = defaultdict(int)
+        self.total = 0
+
+    def add(self, bucket: int, count: int):
+        self.counts[bucket] += count
+        self.total += count
+
+    def percentile(self, pct: float) -> float:
+        target = pct / 100 * self.total
+        seen = 0
+        for bucket in sorted(self.counts):
+            seen += self.counts[bucket]
+            if seen >= target:
+                return BUCKET_BASE ** (bucket + 0.5)
+        return 0.0
+
+
+def _buckets(values: pa.Array) -> pa.Array:
+    clipped = pc.max_element_wise(pc.fill_null(values, 0.0), 0.001)
+    return pc.cast(pc.floor(pc.divide(pc.ln(clipped), LOG_BASE)), pa.int64())
+
+
+def _add_histograms(table: pa.Table, group_col: str, value_col: str, into: dict):
+    table = table.append_column("bucket", _buckets(table[value_col]))
+    grouped = table.group_by([group_col, "bucket"]).aggregate([("bucket", "count")])
+    for group, bucket, count in zip(*(grouped[c].to_pylist() for c in (group_col, "bucket", "bucket_count"))):
+        into.setdefault(group, Histogram()).add(bucket, count)
+
+
+def _add_counts(table: pa.Table, group_cols: list, into: dict):
+    grouped = table.group_by(group_cols).aggregate([([], "count_all")])
+    columns = [grouped[c].to_pylist() for c in group_cols] + [grouped["count_all"].to_pylist()]
+    for *keys, count in zip(*columns):
+        into[tuple(keys)] = into.get(tuple(keys), 0) + count
+
+
+COLUMNS = [
+    "ts", "action", "decision_model", "synthesis_model", "verification_model",
+    "latency_ms", "retries", "retry_actions", "outcome", "llm_failures", "nodes", "variant"
+]
+
+
+def scan(directory: str, since_hours: float = None) -> dict:
+    # The current schema lets files written before a column was added read it as null
+    dataset = ds.dataset(directory, schema=trace_schema(), format="parquet", exclude_invalid_files=True)
+    flt = None
+    if since_hours:
+        flt = ds.field("ts") >= time.time() - since_hours * 3600
+
+    by_route, by_decision_model, by_synthesis_model, by_node, by_variant = {}, {}, {}, {}, {}
+    retry_outcomes, fallbacks = {}, defaultdict(int)
+    rows, shadow_rows = 0, 0
+
+    for batch in dataset.to_batches(columns=COLUMNS, filter=flt):
+        if batch.num_rows == 0:
+            continue
+        table = pa.Table.from_batches([batch])
+        _add_histograms(table.filter(pc.is_valid(table["variant"])), "variant", "latency_ms", by_variant)
+
+        # Shadow runs only count towards their variant, never the production figures
+        shadow = pc.fill_null(pc.starts_with(table["variant"], "shadow:"), False)
+        shadow_rows += pc.sum(shadow).as_py() or 0
+        table = table.filter(pc.invert(shadow))
+        if table.num_rows == 0:
+            continue
+        rows += table.num_rows
+
+        table = table.set_column(table.schema.get_field_index("action"), "action", pc.fill_null(table["action"], "UNKNOWN"))
+        _add_histograms(table, "action", "latency_ms", by_route)
+        _add_histograms(table.filter(pc.is_valid(table["decision_model"])), "decision_model", "latency_ms", by_decision_model)
+        _add_histograms(table.filter(pc.is_valid(table["synthesis_model"])), "synthesis_model", "latency_ms", by_synthesis_model)
+
+        # Per-node latency: one row per node visit
+        nodes = pc.list_flatten(table["nodes"])
+        node_table = pa.table({"node": pc.struct_field(nodes, "node"), "wall_ms": pc.struct_field(nodes, "wall_ms")})
+        _add_histograms(node_table, "node", "wall_ms", by_node)
+
+        # Fallback: a node answered by anything other than its primary model
+        fallbacks["decision"] += pc.sum(pc.not_equal(table["decision_model"], "flash")).as_py() or 0
+        fallbacks["synthesis"] += pc.sum(pc.not_equal(table["synthesis_model"], "flash")).as_py() or 0
+        fallbacks["synthesis_total"] += pc.sum(pc.is_valid(table["synthesis_model"])).as_py() or 0
+        fallbacks["verification"] += pc.sum(pc.not_equal(table["verification_model"], "flash_lite")).as_py() or 0
+        fallbacks["verification_total"] += pc.sum(pc.is_valid(table["verification_model"])).as_py() or 0
+        fallbacks["any_llm_failure"] += pc.sum(pc.greater(table["llm_failures"], 0)).as_py() or 0
+
+        # Retry outcomes by the sequence of recovery actions taken
+        path = pc.fill_null(pc.binary_join(table["retry_actions"], ">"), "")
+        path = pc.if_else(pc.equal(path, ""), "(no retry)", path)
+        _add_counts(pa.table({"path": path, "outcome": table["outcome"]}), ["path", "outcome"], retry_outcomes)
+
+    return {
+        "rows": rows,
+        "shadow_rows": shadow_rows,
+        "by_route": by_route,
+        "by_decision_model": by_decision_model,
+        "by_synthesis_model": by_synthesis_model,
+        "by_node": by_node,
+        "by_variant": by_variant,
+        "fallbacks": fallbacks,
+        "retry_outcomes": retry_outcomes
+    }
+
+
+def print_latency_table(title: str, histograms: dict):
+    print(f"\n{title}")
+    print(f"  {'group':<24} {'count':>10} {'p50 ms':>10} {'p90 ms':>10} {'p99 ms':>10}")
+    for group, hist in sorted(histograms.items(), key=lambda kv: -kv[1].total):
+        print(f"  {str(group):<24} {hist.total:>10} {hist.percentile(50):>10.0f} {hist.percentile(90):>10.0f} {hist.percentile(99):>10.0f}")
+
+
+def report(result: dict):
+    rows = result["rows"]
+    print(f"Requests: {rows}")
+    if result["shadow_rows"]:
+        print(f"Shadow runs: {result['shadow_rows']} (only in the variant table)")
+    if not rows:
+        if result["by_variant"]:
+            print_latency_table("Latency by experiment variant", result["by_variant"])
+        return
+
+    print_latency_table("Latency by route", result["by_route"])
+    print_latency_table("Latency by decision model", result["by_decision_model"])
+    print_latency_table("Latency by synthesis model", result["by_synthesis_model"])
+    print_latency_table("Latency by node (per visit)", result["by_node"])
+    if result["by_variant"]:
+        print_latency_table("Latency by experiment variant", result["by_variant"])
+
+    fb = result["fallbacks"]
+
+    def rate(count, total):
+        return f"{count / total * 100:.2f}%" if total else "n/a"
+
+    print("\nFallback rates")
+    print(f"  decision (not flash):           {rate(fb['decision'], rows)}")
+    print(f"  synthesis (not flash):          {rate(fb['synthesis'], fb['synthesis_total'])}")
+    print(f"  verification (not flash_lite):  {rate(fb['verification'], fb['verification_total'])}")
+    print(f"  requests with any failed call:  {rate(fb['any_llm_failure'], rows)}")
+
+    print("\nRetry outcomes")
+    totals = defaultdict(int)
+    for (path, _), count in result["retry_outcomes"].items():
+        totals[path] += count
+    print(f"  {'actions':<36} {'count':>10} {'pass':>8} {'fail':>8} {'abort':>8}")
+    for path, total in sorted(totals.items(), key=lambda kv: -kv[1]):
+        shares = [rate(result["retry_outcomes"].get((path, outcome), 0), total) for outcome in ("pass", "fail", "abort")]
+        print(f"  {path:<36} {total:>10} {shares[0]:>8} {shares[1]:>8} {shares[2]:>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Summarize request traces written with AGENT_TRACE_DIR.")
+    parser.add_argument("directory", help="Directory containing trace Parquet files")
+    parser.add_argument("--since-hours", type=float, default=None, help="Only include requests from the last N hours")
+    args = parser.parse_args()
+
+    report(scan(args.directory, args.since_hours))
+
+
+if __name__ == "__main__":
+    main()